@@ -0,0 +1,227 @@
+import os
+import json
+import time
+import asyncio
+import hashlib
+import argparse
+import threading
+from urllib.parse import urlsplit, parse_qs
+
+STATUS_TEXT = {200: 'OK', 304: 'Not Modified', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed'}
+
+
+def flatten_signals(processed_data):
+    """
+    Chuyển output của _process_result thành list tín hiệu phẳng để lọc nhanh.
+    """
+    signals = []
+    for interval, groups in processed_data.items():
+        for key, items in groups.items():
+            if key.startswith('div_'):
+                signal_type, _, stage = key[4:].rpartition('_')
+                stage = stage.upper()
+            else:
+                signal_type, stage = key, '-'
+            for item in items:
+                signals.append({
+                    'symbol': item['Tên'],
+                    'interval': interval,
+                    'type': signal_type,
+                    'stage': stage,
+                    'chart_url': item['Chart URL'],
+                })
+    return signals
+
+
+class ResultStore:
+    """
+    Snapshot mới nhất của lần quét, giữ trong bộ nhớ cho API. Mỗi lần publish tăng
+    version; ETag = nonce của process + version + query nên client polling nhận 304 mà
+    không cần tính lại body.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # version bắt đầu lại từ 0 mỗi process, nonce giúp ETag của process cũ không khớp nhầm
+        self.nonce = os.urandom(4).hex()
+        self.version = 0
+        self.updated_at = None
+        self.signals = []
+        self.by_symbol = {}
+        self.processed = {}
+        self.matrix = {}
+        self.intervals = []
+
+    def publish(self, processed_data, matrix=None):
+        signals = flatten_signals(processed_data)
+        by_symbol = {}
+        for signal in signals:
+            by_symbol.setdefault(signal['symbol'], []).append(signal)
+
+        matrix_rows = {}
+        intervals = list(processed_data)
+        if matrix is not None:
+            intervals = [str(c) for c in matrix.columns]
+            for symbol, row in zip(matrix.index, matrix.to_numpy().tolist()):
+                matrix_rows[symbol] = [None if v != v else round(v, 2) for v in row]
+
+        with self.lock:
+            self.signals = signals
+            self.by_symbol = by_symbol
+            self.processed = processed_data
+            self.matrix = matrix_rows
+            self.intervals = intervals
+            self.version += 1
+            self.updated_at = time.time()
+
+    def etag(self, target):
+        digest = hashlib.md5(target.encode('utf-8')).hexdigest()[:12]
+        return f'"{self.nonce}-{self.version}-{digest}"'
+
+    def query_signals(self, params):
+        symbol = params.get('symbol')
+        signals = self.by_symbol.get(symbol, []) if symbol else self.signals
+        for field in ('interval', 'type', 'stage'):
+            value = params.get(field)
+            if value:
+                value = value.upper() if field == 'stage' else value
+                signals = [s for s in signals if s[field] == value]
+        return {'version': self.version, 'updated_at': self.updated_at, 'count': len(signals), 'signals': signals}
+
+    def query_matrix(self, params):
+        symbols = params.get('symbol')
+        interval = params.get('interval')
+        rows = self.matrix
+        if symbols:
+            wanted = symbols.split(',')
+            rows = {s: rows[s] for s in wanted if s in rows}
+        if interval:
+            if interval not in self.intervals:
+                return {'version': self.version, 'intervals': [], 'rsi': {}}
+            column = self.intervals.index(interval)
+            return {
+                'version': self.version,
+                'intervals': [interval],
+                'rsi': {s: [v[column]] for s, v in rows.items()},
+            }
+        return {'version': self.version, 'intervals': self.intervals, 'rsi': rows}
+
+
+class ResultApiServer:
+    """
+    HTTP/JSON server bất đồng bộ (asyncio thuần) phục vụ ResultStore:
+    GET /health, /signals?symbol=&interval=&type=&stage=, /matrix?symbol=&interval=, /results
+    """
+
+    def __init__(self, store, host='127.0.0.1', port=8080):
+        self.store = store
+        self.host = host
+        self.port = port
+        self.thread = None
+
+    def _route(self, path, params):
+        if path == '/health':
+            return {'status': 'ok', 'version': self.store.version, 'updated_at': self.store.updated_at}
+        if path == '/signals':
+            return self.store.query_signals(params)
+        if path == '/matrix':
+            return self.store.query_matrix(params)
+        if path == '/results':
+            return {'version': self.store.version, 'results': self.store.processed}
+        return None
+
+    async def _handle(self, reader, writer):
+        try:
+            request_line = await reader.readline()
+            parts = request_line.decode('latin-1').split()
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                headers[name.strip().lower()] = value.strip()
+
+            if len(parts) < 2:
+                await self._respond(writer, 400, {'error': 'bad request'})
+                return
+            method, target = parts[0], parts[1]
+            if method != 'GET':
+                await self._respond(writer, 405, {'error': 'method not allowed'})
+                return
+
+            url = urlsplit(target)
+            params = {k: v[0] for k, v in parse_qs(url.query).items()}
+
+            not_modified = False
+            with self.store.lock:
+                etag = self.store.etag(target)
+                if url.path != '/health' and headers.get('if-none-match') == etag:
+                    not_modified = True
+                else:
+                    payload = self._route(url.path, params)
+
+            if not_modified:
+                await self._respond(writer, 304, None, etag)
+            elif payload is None:
+                await self._respond(writer, 404, {'error': 'not found'})
+            else:
+                await self._respond(writer, 200, payload, etag)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, writer, status, payload, etag=None):
+        body = b'' if payload is None else json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        headers = [
+            f'HTTP/1.1 {status} {STATUS_TEXT[status]}',
+            'Content-Type: application/json; charset=utf-8',
+            f'Content-Length: {len(body)}',
+            'Connection: close',
+        ]
+        if etag:
+            headers.append(f'ETag: {etag}')
+        writer.write(('\r\n'.join(headers) + '\r\n\r\n').encode('latin-1') + body)
+        await writer.drain()
+
+    async def serve_forever(self):
+        server = await asyncio.start_server(self._handle, self.host, self.port)
+        print(f'🌐 API: http://{self.host}:{self.port} (/signals, /matrix, /results, /health)')
+        async with server:
+            await server.serve_forever()
+
+    def start_in_thread(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=lambda: asyncio.run(self.serve_forever()), daemon=True)
+            self.thread.start()
+        return self.thread
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Quét RSI định kỳ và phục vụ kết quả qua HTTP/JSON')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--intervals', nargs='+', default=['15m', '1h', '4h', '1d'])
+    parser.add_argument('--rsi-period', type=int, default=14)
+    parser.add_argument('--mode', type=int, default=3, choices=[1, 2, 3])
+    parser.add_argument('--every', type=int, default=300, help='Quét lại mỗi N giây')
+    args = parser.parse_args()
+
+    from test_1 import BinanceRSIAnalyzer
+
+    analyzer = BinanceRSIAnalyzer()
+    analyzer.intervals = args.intervals
+    analyzer.rsi_period = args.rsi_period
+    analyzer.analysis_mode = args.mode
+    analyzer.result_store = ResultStore()
+    ResultApiServer(analyzer.result_store, args.host, args.port).start_in_thread()
+
+    while True:
+        started_at = time.time()
+        analyzer._report(analyzer._scan())
+        time.sleep(max(0, args.every - (time.time() - started_at)))
+
+
+if __name__ == "__main__":
+    main()
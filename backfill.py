@@ -0,0 +1,239 @@
+import os
+import glob
+import time
+import argparse
+import threading
+import concurrent.futures
+from datetime import datetime, timezone
+
+import pandas as pd
+from dotenv import load_dotenv
+
+from kline_sources import MARKETS, REST_ENDPOINTS, RestKlineSource, create_source
+
+PAGE_LIMIT = 1000
+KLINE_COLUMNS = [
+    'open_time', 'open', 'high', 'low', 'close', 'volume', 'close_time',
+    'quote_volume', 'trades', 'taker_buy_base', 'taker_buy_quote'
+]
+FLOAT_COLUMNS = ['open', 'high', 'low', 'close', 'volume', 'quote_volume', 'taker_buy_base', 'taker_buy_quote']
+
+
+def to_millis(date_text):
+    dt = datetime.strptime(date_text, '%Y-%m-%d').replace(tzinfo=timezone.utc)
+    return int(dt.timestamp() * 1000)
+
+
+def partition_dir(out_dir, symbol, interval):
+    return os.path.join(out_dir, f'symbol={symbol}', f'interval={interval}')
+
+
+def klines_to_frame(klines):
+    frame = pd.DataFrame([k[:len(KLINE_COLUMNS)] for k in klines], columns=KLINE_COLUMNS)
+    frame[FLOAT_COLUMNS] = frame[FLOAT_COLUMNS].astype('float64')
+    frame[['open_time', 'close_time', 'trades']] = frame[['open_time', 'close_time', 'trades']].astype('int64')
+    return frame
+
+
+def load_history(out_dir, symbol, interval):
+    parts = sorted(
+        glob.glob(os.path.join(partition_dir(out_dir, symbol, interval), 'part-*.parquet')),
+        key=lambda path: int(os.path.basename(path)[5:-8])
+    )
+    if not parts:
+        return pd.DataFrame(columns=KLINE_COLUMNS)
+    frame = pd.concat([pd.read_parquet(path) for path in parts], ignore_index=True)
+    return frame.drop_duplicates('open_time', keep='last').reset_index(drop=True)
+
+
+class HistoryBackfiller:
+    """
+    Tải lịch sử nến dài bằng cách phân trang startTime/endTime (1000 nến mỗi request).
+    Mỗi (symbol, interval) ghi thành các file parquet nén zstd, phân vùng theo
+    symbol=/interval=. Chạy lại sẽ tiếp tục từ nến cuối cùng đã ghi.
+    """
+
+    def __init__(self, source, out_dir, start_time, end_time=None, max_workers=8, batch_pages=20):
+        self.source = source
+        self.out_dir = out_dir
+        self.start_time = start_time
+        self.end_time = end_time
+        self.max_workers = max_workers
+        self.batch_pages = batch_pages
+
+        self.lock = threading.Lock()
+        self.total_bars = 0
+        self.total_requests = 0
+        self.completed = 0
+        self.started_at = None
+
+    def _resume_point(self, symbol, interval):
+        """
+        Trả về (start_time, tail) với tail = (đường dẫn, frame) của part cuối đã ghi.
+        """
+        parts = glob.glob(os.path.join(partition_dir(self.out_dir, symbol, interval), 'part-*.parquet'))
+        if not parts:
+            return self.start_time, None
+        last_part = max(parts, key=lambda path: int(os.path.basename(path)[5:-8]))
+        tail_frame = pd.read_parquet(last_part)
+        # Lấy lại nến cuối vì lúc ghi có thể nó chưa đóng; _write_part ghi đè bản cũ
+        return max(self.start_time, int(tail_frame['open_time'].max())), (last_part, tail_frame)
+
+    def _save_frame(self, directory, frame):
+        file_path = os.path.join(directory, f'part-{int(frame["open_time"].iloc[0])}.parquet')
+        # Ghi ra file tạm rồi rename để file dở dang không làm hỏng lần resume sau
+        tmp_path = file_path + '.tmp'
+        frame.to_parquet(tmp_path, compression='zstd', index=False)
+        os.replace(tmp_path, file_path)
+        return file_path
+
+    def _write_part(self, symbol, interval, klines, tail=None):
+        """
+        Ghi 1 batch. Part cuối (tail) chưa đủ batch_pages * PAGE_LIMIT nến thì được gộp
+        thêm thay vì tạo file mới; nến đã lưu y nguyên thì bỏ qua, batch không có gì mới
+        thì không ghi. Trả về tail mới.
+        """
+        directory = partition_dir(self.out_dir, symbol, interval)
+        os.makedirs(directory, exist_ok=True)
+        frame = klines_to_frame(klines)
+        part_rows = self.batch_pages * PAGE_LIMIT
+
+        if tail is not None:
+            tail_path, tail_frame = tail
+            stored = tail_frame[tail_frame['open_time'].isin(frame['open_time'])]
+            unchanged = frame.merge(stored, how='left', indicator=True)['_merge'].eq('both').to_numpy()
+            if unchanged.all():
+                return tail
+            if len(tail_frame) < part_rows:
+                merged = (
+                    pd.concat([tail_frame, frame], ignore_index=True)
+                    .drop_duplicates('open_time', keep='last')
+                    .sort_values('open_time', ignore_index=True)
+                )
+                self._save_frame(directory, merged.iloc[:part_rows])
+                frame = merged.iloc[part_rows:].reset_index(drop=True)
+                if frame.empty:
+                    return tail_path, merged
+            else:
+                frame = frame[~unchanged].reset_index(drop=True)
+
+        return self._save_frame(directory, frame), frame
+
+    def backfill_series(self, symbol, interval):
+        start_time, tail = self._resume_point(symbol, interval)
+        end_time = self.end_time or int(time.time() * 1000)
+        buffer = []
+        pages = 0
+        bars = 0
+
+        while start_time <= end_time:
+            klines = self.source.get_klines(
+                symbol, interval, limit=PAGE_LIMIT, start_time=start_time, end_time=end_time
+            )
+            with self.lock:
+                self.total_requests += 1
+            if not klines:
+                break
+
+            buffer.extend(klines)
+            pages += 1
+            start_time = int(klines[-1][0]) + 1
+
+            if pages >= self.batch_pages:
+                tail = self._write_part(symbol, interval, buffer, tail)
+                bars += len(buffer)
+                with self.lock:
+                    self.total_bars += len(buffer)
+                buffer = []
+                pages = 0
+
+            if len(klines) < PAGE_LIMIT:
+                break
+
+        if buffer:
+            tail = self._write_part(symbol, interval, buffer, tail)
+            bars += len(buffer)
+            with self.lock:
+                self.total_bars += len(buffer)
+        return bars
+
+    def _report(self, total, symbol, interval, bars):
+        elapsed = max(time.monotonic() - self.started_at, 1e-9)
+        print(
+            f'\r📥 {self.completed}/{total} | {symbol} {interval}: +{bars} nến | '
+            f'{self.total_bars} nến, {self.total_requests} req | '
+            f'{self.total_bars / elapsed:.0f} nến/s',
+            end='', flush=True
+        )
+
+    def run(self, symbols, intervals):
+        jobs = [(symbol, interval) for symbol in symbols for interval in intervals]
+        failures = []
+        self.started_at = time.monotonic()
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {
+                executor.submit(self.backfill_series, symbol, interval): (symbol, interval)
+                for symbol, interval in jobs
+            }
+            for future in concurrent.futures.as_completed(futures):
+                symbol, interval = futures[future]
+                try:
+                    bars = future.result()
+                except Exception as e:
+                    failures.append((symbol, interval, str(e)))
+                    bars = 0
+                with self.lock:
+                    self.completed += 1
+                    self._report(len(jobs), symbol, interval, bars)
+
+        elapsed = time.monotonic() - self.started_at
+        print(f'\n✅ Backfill xong: {self.total_bars} nến trong {elapsed:.1f}s')
+        for symbol, interval, error in failures:
+            print(f'   ❌ {symbol} {interval}: {error}')
+        return failures
+
+
+def load_symbol_file(file_path):
+    with open(file_path, 'r') as file:
+        return [line.strip() for line in file.readlines() if line.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Backfill lịch sử nến Binance ra parquet')
+    parser.add_argument('--symbols', nargs='*', help='Danh sách symbol (mặc định: textcoin.txt)')
+    parser.add_argument('--intervals', nargs='+', default=['1h'])
+    parser.add_argument('--start', required=True, help='Ngày bắt đầu YYYY-MM-DD (UTC)')
+    parser.add_argument('--end', help='Ngày kết thúc YYYY-MM-DD (UTC), mặc định: hiện tại')
+    parser.add_argument('--market', default='spot', choices=MARKETS)
+    parser.add_argument('--base-url', help='Gọi REST trực tiếp tới base URL này (ví dụ API giả lập local)')
+    parser.add_argument('--out', default='history')
+    parser.add_argument('--workers', type=int, default=8)
+    args = parser.parse_args()
+
+    load_dotenv()
+    if args.base_url:
+        if args.market not in REST_ENDPOINTS:
+            parser.error(f'--base-url không hỗ trợ market {args.market} (chọn: {", ".join(REST_ENDPOINTS)})')
+        source = RestKlineSource(args.base_url, args.market)
+    elif args.market == 'replay':
+        source = create_source('replay', replay_dir=os.getenv('REPLAY_DIR', 'replay_data'))
+    else:
+        from binance.client import Client
+        source = create_source(args.market, Client(os.getenv('BINANCE_API_KEY'), os.getenv('BINANCE_API_SECRET')))
+
+    symbols = args.symbols or load_symbol_file(
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), 'textcoin.txt')
+    )
+    backfiller = HistoryBackfiller(
+        source,
+        args.out,
+        start_time=to_millis(args.start),
+        end_time=to_millis(args.end) if args.end else None,
+        max_workers=args.workers,
+    )
+    backfiller.run(symbols, args.intervals)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+import os
+import sys
+import statistics
+import subprocess
+
+RUNS = 7
+
+# Khởi động hiện tại: import test_1 + tạo BinanceRSIAnalyzer (không chạm mạng)
+LAZY = """
+import time
+t = time.perf_counter()
+import test_1
+test_1.BinanceRSIAnalyzer()
+print(time.perf_counter() - t)
+"""
+
+# Mô phỏng khởi động cũ: nạp sẵn các thư viện sink và tạo Client (có ping) ngay lập tức
+EAGER = """
+import time
+t = time.perf_counter()
+import test_1
+import gspread, requests
+from openpyxl.styles import Border, Side, Font, Alignment, PatternFill
+from oauth2client.service_account import ServiceAccountCredentials
+analyzer = test_1.BinanceRSIAnalyzer()
+try:
+    analyzer.client
+except Exception:
+    pass
+print(time.perf_counter() - t)
+"""
+
+
+def measure(code):
+    cwd = os.path.dirname(os.path.abspath(__file__))
+    timings = []
+    for _ in range(RUNS):
+        output = subprocess.run(
+            [sys.executable, '-c', code], cwd=cwd, capture_output=True, text=True, check=True
+        ).stdout
+        timings.append(float(output.strip().splitlines()[-1]))
+    return statistics.median(timings)
+
+
+if __name__ == "__main__":
+    eager = measure(EAGER)
+    lazy = measure(LAZY)
+    print(f'Eager startup: {eager * 1000:.0f} ms (median {RUNS} lần)')
+    print(f'Lazy startup:  {lazy * 1000:.0f} ms (median {RUNS} lần)')
+    print(f'Nhanh hơn:     {eager / lazy:.1f}x')
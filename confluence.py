@@ -0,0 +1,105 @@
+import pandas as pd
+
+INTERVAL_WEIGHTS = {'5m': 0.5, '15m': 0.75, '30m': 1.0, '1h': 1.5, '4h': 2.0, '1d': 3.0, '1w': 4.0}
+STAGE_WEIGHTS = {'CONFIRMED': 3.0, 'DEVELOPING': 2.0, 'FORMING': 1.0}
+HIDDEN_WEIGHT = 0.75
+RSI_WEIGHT = 2.0
+COLUMNS = ['Tên', 'Hướng', 'Score', 'Số khung', 'Chi tiết', 'Chart URL']
+
+
+class ConfluenceScorer:
+    """
+    Ghép tín hiệu của nhiều khung thời gian theo symbol (dict index, O(n)) và chấm điểm
+    mức đồng thuận: RSI quá mua/quá bán và phân kỳ cùng hướng trên nhiều khung.
+    Đầu vào là output đã lọc của _process_result, nên analysis_mode, INDICATOR_FILTERS
+    và ngưỡng theo profile được áp giống hệt Excel/Telegram.
+    """
+
+    def __init__(self, min_intervals=2, chart_url=None):
+        self.min_intervals = min_intervals
+        self.chart_url = chart_url or (lambda symbol: f'https://www.tradingview.com/chart/?symbol=BINANCE:{symbol}')
+
+    def _interval_signals(self, entries, current_rsi=None):
+        """
+        entries: [(key, item)] của 1 (symbol, interval). Trả về [(direction, score, mô tả)].
+        """
+        signals = []
+        for key, item in entries:
+            if key in ('rsi_high', 'rsi_low'):
+                direction = 'bearish' if key == 'rsi_high' else 'bullish'
+                text = f'RSI {current_rsi}' if current_rsi is not None else item['Loại']
+                signals.append((direction, RSI_WEIGHT, text))
+                continue
+
+            kind = key[4:].rpartition('_')[0]
+            stage = item['Giai đoạn']
+            direction = 'bullish' if kind.endswith('bullish') else 'bearish'
+            score = STAGE_WEIGHTS.get(stage, 1.0)
+            if kind.startswith('hidden'):
+                score *= HIDDEN_WEIGHT
+            label = 'HDIV' if kind.startswith('hidden') else 'DIV'
+            signals.append((direction, score, f"{label} {stage}"))
+        return signals
+
+    def index(self, processed_data):
+        by_symbol = {}
+        for interval, groups in processed_data.items():
+            for key, items in groups.items():
+                for item in items:
+                    by_symbol.setdefault(item['Tên'], {}).setdefault(interval, []).append((key, item))
+        return by_symbol
+
+    def score(self, processed_data, intervals, current_rsi=None):
+        """
+        current_rsi: {(symbol, interval): RSI hiện tại}, chỉ dùng để hiển thị.
+        """
+        current_rsi = current_rsi or {}
+        order = {interval: i for i, interval in enumerate(intervals)}
+        rows = []
+
+        for symbol, per_interval in self.index(processed_data).items():
+            totals = {'bullish': 0.0, 'bearish': 0.0}
+            aligned = {'bullish': [], 'bearish': []}
+
+            for interval in sorted(per_interval, key=lambda i: order.get(i, len(order))):
+                weight = INTERVAL_WEIGHTS.get(interval, 1.0)
+                details = {'bullish': [], 'bearish': []}
+                entries = per_interval[interval]
+                for direction, score, text in self._interval_signals(entries, current_rsi.get((symbol, interval))):
+                    totals[direction] += score * weight
+                    details[direction].append(text)
+                for direction, texts in details.items():
+                    if texts:
+                        aligned[direction].append(f"{interval}: {', '.join(texts)}")
+
+            direction = 'bearish' if totals['bearish'] >= totals['bullish'] else 'bullish'
+            count = len(aligned[direction])
+            if count < self.min_intervals:
+                continue
+
+            # Thưởng thêm khi nhiều khung cùng hướng, trừ điểm tín hiệu ngược hướng
+            opposite = 'bullish' if direction == 'bearish' else 'bearish'
+            score = (totals[direction] - totals[opposite]) * (1 + 0.25 * (count - 1))
+            rows.append({
+                'Tên': symbol,
+                'Hướng': '🔴 Bearish' if direction == 'bearish' else '🟢 Bullish',
+                'Score': round(score, 2),
+                'Số khung': count,
+                'Chi tiết': ' | '.join(aligned[direction]),
+                'Chart URL': self.chart_url(symbol),
+            })
+
+        table = pd.DataFrame(rows, columns=COLUMNS)
+        return table.sort_values(['Score', 'Số khung', 'Tên'], ascending=[False, False, True], ignore_index=True)
+
+    def telegram_digest(self, table, top=15):
+        lines = ["🎯 <b>Multi-timeframe Confluence</b>"]
+        if table.empty:
+            lines.append("\n✅ Không có symbol đồng thuận trên nhiều khung")
+            return "\n".join(lines)
+        for _, row in table.head(top).iterrows():
+            lines.append(
+                f"\n{row['Hướng']} <b>{row['Tên']}</b> | Score {row['Score']} ({row['Số khung']} khung)"
+                f"\n   {row['Chi tiết']} | <a href='{row['Chart URL']}'>Chart</a>"
+            )
+        return "\n".join(lines)
@@ -0,0 +1,99 @@
+import numpy as np
+import pandas as pd
+
+OPEN, HIGH, LOW, CLOSE, VOLUME = range(5)
+
+
+def ohlcv_buffer(klines):
+    """
+    Chuyển klines Binance thành 1 mảng float64 (n, 5): open, high, low, close, volume.
+    Tất cả indicator đọc chung buffer này thay vì tạo Series riêng cho từng cột.
+    """
+    return np.array([k[1:6] for k in klines], dtype=np.float64)
+
+
+def ema(values, span):
+    return pd.Series(values).ewm(span=span, adjust=False).mean().to_numpy()
+
+
+def wilder(values, period):
+    return pd.Series(values).ewm(alpha=1 / period, adjust=False).mean().to_numpy()
+
+
+def rolling_sum(values, period):
+    out = np.full(len(values), np.nan)
+    if len(values) < period:
+        return out
+    csum = np.cumsum(np.insert(values, 0, 0.0))
+    out[period - 1:] = csum[period:] - csum[:-period]
+    return out
+
+
+def sma(values, period):
+    return rolling_sum(values, period) / period
+
+
+def atr(high, low, close, period=14):
+    prev_close = np.concatenate(([close[0]], close[:-1]))
+    true_range = np.maximum(high - low, np.maximum(np.abs(high - prev_close), np.abs(low - prev_close)))
+    return wilder(true_range, period)
+
+
+def stoch_rsi(rsi, period=14, smooth_k=3, smooth_d=3):
+    rsi = np.asarray(rsi, dtype=np.float64)
+    stoch = np.full(len(rsi), np.nan)
+    if len(rsi) >= period:
+        windows = np.lib.stride_tricks.sliding_window_view(rsi, period)
+        lowest = windows.min(axis=1)
+        highest = windows.max(axis=1)
+        span = highest - lowest
+        with np.errstate(invalid='ignore', divide='ignore'):
+            stoch[period - 1:] = np.where(span > 0, (rsi[period - 1:] - lowest) / span * 100, 50.0)
+    k = pd.Series(stoch).rolling(smooth_k).mean().to_numpy()
+    d = pd.Series(k).rolling(smooth_d).mean().to_numpy()
+    return k, d
+
+
+def mfi(high, low, close, volume, period=14):
+    typical = (high + low + close) / 3
+    money_flow = typical * volume
+    direction = np.sign(np.diff(typical, prepend=typical[0]))
+    positive = rolling_sum(np.where(direction > 0, money_flow, 0.0), period)
+    negative = rolling_sum(np.where(direction < 0, money_flow, 0.0), period)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        values = np.where(negative > 0, 100 - 100 / (1 + positive / negative), 100.0)
+    values[np.isnan(negative)] = np.nan
+    return values
+
+
+def compute_indicators(ohlcv, rsi, ema_fast=20, ema_slow=50, period=14, volume_period=20):
+    """
+    Tính các indicator phụ trên buffer OHLCV đã có, trả về giá trị của nến cuối.
+    Nến cuối là nến đang chạy, volume của nó mới tích lũy một phần nên mfi và
+    volume_ratio lấy ở nến đã đóng gần nhất.
+    """
+    high = ohlcv[:, HIGH]
+    low = ohlcv[:, LOW]
+    close = ohlcv[:, CLOSE]
+    volume = ohlcv[:, VOLUME]
+
+    k, d = stoch_rsi(rsi, period)
+    atr_values = atr(high, low, close, period)
+    volume_avg = sma(volume, volume_period)
+
+    def last(values, offset=1):
+        if len(values) < offset:
+            return None
+        value = values[-offset]
+        return None if np.isnan(value) else round(float(value), 4)
+
+    return {
+        'stoch_rsi_k': last(k),
+        'stoch_rsi_d': last(d),
+        'mfi': last(mfi(high, low, close, volume, period), offset=2),
+        'ema_fast': last(ema(close, ema_fast)),
+        'ema_slow': last(ema(close, ema_slow)),
+        'atr': last(atr_values),
+        'atr_pct': last(atr_values / close * 100),
+        'volume_ratio': last(volume / volume_avg, offset=2),
+    }
@@ -0,0 +1,223 @@
+import os
+import csv
+import json
+import time
+import threading
+from abc import ABC, abstractmethod
+
+
+class RateLimiter:
+    """
+    Token bucket theo request weight / phút, mỗi nguồn dữ liệu giữ budget riêng.
+    """
+
+    def __init__(self, weight_per_minute):
+        self.capacity = weight_per_minute
+        self.tokens = float(weight_per_minute)
+        self.refill_rate = weight_per_minute / 60.0
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, weight=1):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.refill_rate)
+                self.updated_at = now
+                if self.tokens >= weight:
+                    self.tokens -= weight
+                    return
+                wait = (weight - self.tokens) / self.refill_rate
+            time.sleep(wait)
+
+
+class KlineSource(ABC):
+    """
+    Interface nguồn nến. get_klines trả về list theo format Binance:
+    [open_time, open, high, low, close, volume, close_time, ...]
+    """
+
+    market = None
+    weight_per_minute = None
+
+    def __init__(self):
+        self.rate_limiter = RateLimiter(self.weight_per_minute) if self.weight_per_minute else None
+
+    def request_weight(self, limit):
+        return 1
+
+    def get_klines(self, symbol, interval, limit=200, start_time=None, end_time=None):
+        if self.rate_limiter:
+            self.rate_limiter.acquire(self.request_weight(limit))
+        params = {'symbol': symbol, 'interval': interval, 'limit': limit}
+        if start_time is not None:
+            params['startTime'] = int(start_time)
+        if end_time is not None:
+            params['endTime'] = int(end_time)
+        return self._request_klines(params)
+
+    @abstractmethod
+    def _request_klines(self, params):
+        pass
+
+    def chart_url(self, symbol):
+        return f'https://www.tradingview.com/chart/?symbol=BINANCE:{symbol}'
+
+
+class BinanceKlineSource(KlineSource):
+    """
+    Nguồn dùng python-binance. client có thể là một hàm trả về Client để chỉ
+    kết nối khi thực sự cần lấy dữ liệu.
+    """
+
+    def __init__(self, client):
+        super().__init__()
+        self._client = client
+
+    @property
+    def client(self):
+        if callable(self._client):
+            return self._client()
+        return self._client
+
+
+class SpotKlineSource(BinanceKlineSource):
+    market = 'spot'
+    weight_per_minute = 6000
+
+    def request_weight(self, limit):
+        return 2
+
+    def _request_klines(self, params):
+        return self.client.get_klines(**params)
+
+
+class UsdmFuturesKlineSource(BinanceKlineSource):
+    market = 'usdm'
+    weight_per_minute = 2400
+
+    def request_weight(self, limit):
+        if limit < 100:
+            return 1
+        if limit < 500:
+            return 2
+        if limit <= 1000:
+            return 5
+        return 10
+
+    def _request_klines(self, params):
+        return self.client.futures_klines(**params)
+
+    def chart_url(self, symbol):
+        return f'https://www.tradingview.com/chart/?symbol=BINANCE:{symbol}.P'
+
+
+class CoinmFuturesKlineSource(UsdmFuturesKlineSource):
+    market = 'coinm'
+    weight_per_minute = 2400
+
+    def _request_klines(self, params):
+        return self.client.futures_coin_klines(**params)
+
+    def chart_url(self, symbol):
+        return f"https://www.tradingview.com/chart/?symbol=BINANCE:{symbol.replace('_PERP', '')}.P"
+
+
+class ReplayKlineSource(KlineSource):
+    """
+    Đọc nến từ file local ({symbol}_{interval}.json hoặc .csv), không cần mạng.
+    Dùng cho test, benchmark và chạy lại dữ liệu cũ.
+    """
+
+    market = 'replay'
+
+    def __init__(self, data_dir):
+        super().__init__()
+        self.data_dir = data_dir
+        self.cache = {}
+        self.lock = threading.Lock()
+
+    def _load(self, symbol, interval):
+        key = (symbol, interval)
+        with self.lock:
+            if key in self.cache:
+                return self.cache[key]
+
+        base = os.path.join(self.data_dir, f'{symbol}_{interval}')
+        if os.path.exists(base + '.json'):
+            with open(base + '.json', 'r') as file:
+                klines = json.load(file)
+        elif os.path.exists(base + '.csv'):
+            with open(base + '.csv', 'r', newline='') as file:
+                klines = [row for row in csv.reader(file) if row and row[0].isdigit()]
+        else:
+            raise FileNotFoundError(f'Không có dữ liệu replay cho {symbol} {interval}')
+
+        klines = [[int(k[0])] + list(k[1:]) for k in klines]
+        with self.lock:
+            self.cache[key] = klines
+        return klines
+
+    def _request_klines(self, params):
+        klines = self._load(params['symbol'], params['interval'])
+        start_time = params.get('startTime')
+        end_time = params.get('endTime')
+        if start_time is not None:
+            klines = [k for k in klines if k[0] >= start_time]
+            if end_time is not None:
+                klines = [k for k in klines if k[0] <= end_time]
+            return klines[:params['limit']]
+        if end_time is not None:
+            klines = [k for k in klines if k[0] <= end_time]
+        return klines[-params['limit']:]
+
+
+class RestKlineSource(KlineSource):
+    """
+    Gọi thẳng REST endpoint klines qua requests, base_url có thể trỏ tới API giả lập local.
+    Endpoint, budget weight/phút và weight mỗi request theo market (REST_ENDPOINTS).
+    """
+
+    def __init__(self, base_url, market='spot', timeout=30):
+        path, source_class = REST_ENDPOINTS[market]
+        self.market = market
+        self.weight_per_minute = source_class.weight_per_minute
+        self.source_class = source_class
+        super().__init__()
+        self.url = base_url.rstrip('/') + path
+        self.timeout = timeout
+
+    def request_weight(self, limit):
+        return self.source_class.request_weight(self, limit)
+
+    def chart_url(self, symbol):
+        return self.source_class.chart_url(self, symbol)
+
+    def _request_klines(self, params):
+        import requests
+
+        response = requests.get(self.url, params=params, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+
+MARKETS = ['spot', 'usdm', 'coinm', 'replay']
+
+# Endpoint klines theo market, RestKlineSource dùng weight của class nguồn tương ứng
+REST_ENDPOINTS = {
+    'spot': ('/api/v3/klines', SpotKlineSource),
+    'usdm': ('/fapi/v1/klines', UsdmFuturesKlineSource),
+    'coinm': ('/dapi/v1/klines', CoinmFuturesKlineSource),
+}
+
+
+def create_source(market, client=None, replay_dir=None):
+    if market == 'spot':
+        return SpotKlineSource(client)
+    if market == 'usdm':
+        return UsdmFuturesKlineSource(client)
+    if market == 'coinm':
+        return CoinmFuturesKlineSource(client)
+    if market == 'replay':
+        return ReplayKlineSource(replay_dir)
+    raise ValueError(f'Market không hợp lệ: {market}')
@@ -0,0 +1,141 @@
+import numpy as np
+import pandas as pd
+
+QUOTE_ASSETS = ['FDUSD', 'USDT', 'USDC', 'TUSD', 'BUSD', 'BTC', 'ETH', 'BNB', 'TRY', 'EUR', 'USD']
+QUANTILES = [0.1, 0.25, 0.5, 0.75, 0.9]
+
+
+def quote_asset(symbol):
+    symbol = symbol.split(':')[-1]
+    # Hợp đồng COIN-M (BTCUSD_PERP, BTCUSD_250627) luôn quote bằng USD,
+    # không để DOTUSD bị khớp nhầm thành quote TUSD
+    pair, _, contract = symbol.partition('_')
+    if contract and pair.endswith('USD') and len(pair) > 3:
+        return 'USD'
+    symbol = pair
+    for quote in QUOTE_ASSETS:
+        if symbol.endswith(quote) and len(symbol) > len(quote):
+            return quote
+    return 'OTHER'
+
+
+class MarketBreadth:
+    """
+    Ma trận RSI symbols × intervals của toàn thị trường và các thống kê breadth.
+    Dữ liệu lấy từ current_rsi đã tính trong lúc quét, không tốn thêm API weight.
+    """
+
+    def __init__(self, results, intervals, overbought=80, oversold=20, groups=None):
+        self.intervals = list(intervals)
+
+        rows = [(r['symbol'], r['interval'], r['current_rsi']) for r in results]
+        frame = pd.DataFrame(rows, columns=['symbol', 'interval', 'rsi'])
+        self.matrix = (
+            frame.pivot_table(index='symbol', columns='interval', values='rsi', aggfunc='last')
+            .reindex(columns=self.intervals)
+            .astype('float32')
+        )
+
+        # overbought/oversold: 1 số, hoặc mảng theo thứ tự results (ngưỡng profile của từng series)
+        frame['overbought'] = frame['rsi'].to_numpy() >= np.asarray(overbought, dtype=np.float64)
+        frame['oversold'] = frame['rsi'].to_numpy() <= np.asarray(oversold, dtype=np.float64)
+        self.flags = frame.drop_duplicates(['symbol', 'interval'], keep='last').set_index(['symbol', 'interval'])
+        self.is_overbought = self._flag_matrix('overbought')
+        self.is_oversold = self._flag_matrix('oversold')
+
+        # groups: dict symbol -> sector, mặc định nhóm theo quote asset
+        self.groups = pd.Series(
+            {s: (groups or {}).get(s) or quote_asset(s) for s in self.matrix.index},
+            dtype='object'
+        )
+
+    def _flag_matrix(self, column):
+        return (
+            self.flags[column].unstack()
+            .reindex(index=self.matrix.index, columns=self.intervals)
+            .fillna(False)
+            .astype(bool)
+        )
+
+    def interval_stats(self):
+        values = self.matrix
+        count = values.notna().sum()
+        stats = pd.DataFrame({
+            'count': count,
+            'pct_overbought': self.is_overbought.sum() / count.where(count > 0) * 100,
+            'pct_oversold': self.is_oversold.sum() / count.where(count > 0) * 100,
+            'mean': values.mean(),
+        })
+        quantiles = values.quantile(QUANTILES).T
+        quantiles.columns = [f'q{int(q * 100)}' for q in QUANTILES]
+        return stats.join(quantiles).round(2)
+
+    def group_stats(self):
+        if self.matrix.empty:
+            return pd.DataFrame()
+        long = self.matrix.astype('float64').stack().dropna().rename('rsi').reset_index()
+        long['group'] = long['symbol'].map(self.groups)
+        long = long.join(self.flags[['overbought', 'oversold']], on=['symbol', 'interval'])
+        grouped = long.groupby(['group', 'interval'])
+        stats = pd.DataFrame({
+            'count': grouped['rsi'].count(),
+            'mean': grouped['rsi'].mean(),
+            'median': grouped['rsi'].median(),
+            'pct_overbought': grouped['overbought'].mean() * 100,
+            'pct_oversold': grouped['oversold'].mean() * 100,
+        })
+        return stats.round(2)
+
+    def save_matrix(self, file_path):
+        np.savez_compressed(
+            file_path,
+            symbols=np.array(self.matrix.index, dtype=str),
+            intervals=np.array(self.intervals, dtype=str),
+            rsi=self.matrix.to_numpy(dtype=np.float32),
+        )
+
+    @staticmethod
+    def load_matrix(file_path):
+        with np.load(file_path) as data:
+            return pd.DataFrame(data['rsi'], index=data['symbols'], columns=data['intervals'])
+
+    def render_heatmap(self, file_path, max_symbols=None):
+        try:
+            import matplotlib
+            matplotlib.use('Agg')
+            import matplotlib.pyplot as plt
+        except ImportError:
+            print('⚠️ Chưa cài matplotlib, bỏ qua heatmap')
+            return False
+
+        if self.matrix.empty:
+            return False
+
+        # Sắp xếp theo RSI trung bình để các cụm quá mua/quá bán nằm cạnh nhau
+        ordered = self.matrix.loc[self.matrix.mean(axis=1).sort_values(ascending=False).index]
+        if max_symbols:
+            ordered = ordered.head(max_symbols)
+
+        height = max(4, len(ordered) * 0.18)
+        fig, ax = plt.subplots(figsize=(2 + len(self.intervals) * 1.2, height))
+        image = ax.imshow(ordered.to_numpy(), aspect='auto', cmap='RdYlGn_r', vmin=0, vmax=100)
+        ax.set_xticks(range(len(self.intervals)))
+        ax.set_xticklabels(self.intervals)
+        ax.set_yticks(range(len(ordered)))
+        ax.set_yticklabels(ordered.index, fontsize=6)
+        ax.xaxis.tick_top()
+        fig.colorbar(image, ax=ax, label='RSI')
+        fig.tight_layout()
+        fig.savefig(file_path, dpi=100)
+        plt.close(fig)
+        return True
+
+    def summary_lines(self):
+        lines = []
+        for interval, row in self.interval_stats().iterrows():
+            lines.append(
+                f"   ⏰ {interval}: n={int(row['count'])} | "
+                f"OB={row['pct_overbought']:.1f}% | OS={row['pct_oversold']:.1f}% | "
+                f"median={row['q50']:.1f} (q10={row['q10']:.1f}, q90={row['q90']:.1f})"
+            )
+        return lines
@@ -0,0 +1,50 @@
+import numpy as np
+
+
+def swing_highs(values):
+    """
+    Index các đỉnh xác nhận: values[i] > values[i-1] và values[i] > values[i+1].
+    Tìm bằng đổi dấu của np.diff thay vì duyệt từng nến.
+    """
+    slope = np.sign(np.diff(values))
+    return np.flatnonzero((slope[:-1] > 0) & (slope[1:] < 0)) + 1
+
+
+def swing_lows(values):
+    slope = np.sign(np.diff(values))
+    return np.flatnonzero((slope[:-1] < 0) & (slope[1:] > 0)) + 1
+
+
+class PivotIndex:
+    """
+    Chỉ mục đỉnh/đáy RSI cho một cửa sổ scan (giá HIGH/LOW được đọc tại các pivot RSI),
+    dựng 1 lần và dùng chung cho mọi biến thể phân kỳ (regular, hidden, ...).
+    """
+
+    def __init__(self, rsi, highs, lows):
+        self.rsi = np.asarray(rsi, dtype=np.float64)
+        self.highs = np.asarray(highs, dtype=np.float64)
+        self.lows = np.asarray(lows, dtype=np.float64)
+        n = len(self.rsi)
+
+        self.rsi_peaks = swing_highs(self.rsi)
+        self.rsi_bottoms = swing_lows(self.rsi)
+
+        self.is_rsi_peak = np.zeros(n, dtype=bool)
+        self.is_rsi_peak[self.rsi_peaks] = True
+        self.is_rsi_bottom = np.zeros(n, dtype=bool)
+        self.is_rsi_bottom[self.rsi_bottoms] = True
+
+    def __len__(self):
+        return len(self.rsi)
+
+    def pivot_pairs(self, pivots, min_distance, max_distance):
+        """
+        Các cặp (pivot trước, pivot cuối cùng) cách nhau trong [min_distance, max_distance] nến.
+        """
+        if len(pivots) < 2:
+            return np.empty(0, dtype=np.int64), None
+        last = pivots[-1]
+        earlier = pivots[:-1]
+        distance = last - earlier
+        return earlier[(distance >= min_distance) & (distance <= max_distance)], last
@@ -0,0 +1,204 @@
+import os
+import fnmatch
+import threading
+from collections import namedtuple
+
+import numpy as np
+
+PARAM_FIELDS = [
+    'overbought', 'oversold', 'upper_mid', 'lower_mid', 'confirm_bearish', 'confirm_bullish',
+    'scan_candles', 'min_candle_distance', 'max_candle_distance',
+]
+INT_FIELDS = {'scan_candles', 'min_candle_distance', 'max_candle_distance'}
+
+ThresholdParams = namedtuple('ThresholdParams', PARAM_FIELDS)
+
+
+def load_profile_config(file_path):
+    """
+    Đọc file profile dạng TOML (.toml) hoặc YAML (.yaml/.yml).
+    """
+    extension = os.path.splitext(file_path)[1].lower()
+    if extension == '.toml':
+        import tomllib
+        with open(file_path, 'rb') as file:
+            return tomllib.load(file)
+    if extension in ('.yaml', '.yml'):
+        import yaml
+        with open(file_path, 'r', encoding='utf-8') as file:
+            return yaml.safe_load(file) or {}
+    raise ValueError(f'Không hỗ trợ định dạng profile: {file_path} (dùng .toml, .yaml hoặc .yml)')
+
+
+def _check_fields(where, values):
+    unknown = set(values) - set(PARAM_FIELDS)
+    if unknown:
+        raise ValueError(f'{where}: tham số không hợp lệ {", ".join(sorted(unknown))}')
+
+
+def _validate(where, params):
+    if not (params.oversold < params.lower_mid <= params.upper_mid < params.overbought):
+        raise ValueError(f'{where}: cần oversold < lower_mid <= upper_mid < overbought')
+    if not (0 < params.min_candle_distance <= params.max_candle_distance < params.scan_candles):
+        raise ValueError(f'{where}: cần 0 < min_candle_distance <= max_candle_distance < scan_candles')
+
+
+class ThresholdProfile:
+    """
+    Một bộ ngưỡng: giá trị gốc, ghi đè theo interval, theo nhóm symbol và theo nhóm + interval
+    (thứ tự ưu tiên tăng dần).
+    """
+
+    def __init__(self, name, base, intervals=None, groups=None):
+        self.name = name
+        self.base = dict(base)
+        self.intervals = {str(k): dict(v) for k, v in (intervals or {}).items()}
+        self.groups = {str(k): dict(v) for k, v in (groups or {}).items()}
+
+        _check_fields(f'profile {name}', self.base)
+        for interval, values in self.intervals.items():
+            _check_fields(f'profile {name}.intervals.{interval}', values)
+        for group, values in self.groups.items():
+            _check_fields(f'profile {name}.groups.{group}', {k: v for k, v in values.items() if k != 'intervals'})
+            for interval, overrides in values.get('intervals', {}).items():
+                _check_fields(f'profile {name}.groups.{group}.intervals.{interval}', overrides)
+
+    @classmethod
+    def from_config(cls, name, config, defaults):
+        config = dict(config or {})
+        intervals = config.pop('intervals', None)
+        groups = config.pop('groups', None)
+        return cls(name, {**defaults, **config}, intervals, groups)
+
+    def resolve(self, interval, group=None):
+        values = dict(self.base)
+        values.update(self.intervals.get(interval, {}))
+        if group in self.groups:
+            group_values = self.groups[group]
+            values.update({k: v for k, v in group_values.items() if k != 'intervals'})
+            values.update(group_values.get('intervals', {}).get(interval, {}))
+
+        params = ThresholdParams(**{
+            field: int(values[field]) if field in INT_FIELDS else float(values[field])
+            for field in PARAM_FIELDS
+        })
+        _validate(f'profile {self.name} ({group or "*"}, {interval})', params)
+        return params
+
+
+class ProfileSet:
+    """
+    Các profile được đánh giá trong cùng 1 lần quét, biên dịch thành bảng tham số
+    table[profile, row, field] với mỗi row là 1 series (symbol, interval). Code xử lý
+    theo lô lấy cột ngưỡng bằng index mảng thay vì if/else theo từng series.
+    Profile đầu tiên là profile chính (dùng cho Telegram, Google Sheet, API, journal).
+    """
+
+    def __init__(self, profiles, groups=None, source=None):
+        if not profiles:
+            raise ValueError('Cần ít nhất 1 profile')
+        self.profiles = list(profiles)
+        self.names = [p.name for p in self.profiles]
+        self.primary = self.names[0]
+        # groups: {tên nhóm: [symbol hoặc pattern fnmatch]}, nhóm khai báo trước được ưu tiên
+        self.groups = {str(k): [str(p) for p in v] for k, v in (groups or {}).items()}
+        self.source = source
+
+        self.lock = threading.Lock()
+        self.row_index = {}
+        self.row_groups = []
+        self.row_params = []
+        self.table = np.zeros((len(self.profiles), 0, len(PARAM_FIELDS)), dtype=np.float64)
+        self._resolved = {}
+
+    @classmethod
+    def from_config(cls, config, defaults, names=None, source=None):
+        profile_configs = config.get('profiles') or {'default': {}}
+        names = names or list(profile_configs)
+        missing = [name for name in names if name not in profile_configs]
+        if missing:
+            raise ValueError(f'Không có profile: {", ".join(missing)} (có: {", ".join(profile_configs)})')
+        profiles = [ThresholdProfile.from_config(name, profile_configs[name], defaults) for name in names]
+        return cls(profiles, config.get('groups'), source)
+
+    @classmethod
+    def from_env(cls, defaults, base_dir='.'):
+        """
+        RSI_PROFILES_FILE: đường dẫn file profile (mặc định rsi_profiles.toml nếu có).
+        RSI_PROFILES: danh sách profile cần chạy, ví dụ default,scalp (mặc định: tất cả).
+        Không có file thì dùng 1 profile 'default' từ các hằng số của analyzer.
+        """
+        file_path = os.getenv('RSI_PROFILES_FILE') or os.path.join(base_dir, 'rsi_profiles.toml')
+        names = [n.strip() for n in os.getenv('RSI_PROFILES', '').split(',') if n.strip()] or None
+        if not os.path.exists(file_path):
+            if os.getenv('RSI_PROFILES_FILE'):
+                raise FileNotFoundError(f'Không tìm thấy RSI_PROFILES_FILE: {file_path}')
+            return cls([ThresholdProfile('default', defaults)])
+        return cls.from_config(load_profile_config(file_path), defaults, names, source=file_path)
+
+    def group_of(self, label):
+        symbol = label.rpartition(':')[2]
+        for group, patterns in self.groups.items():
+            for pattern in patterns:
+                if fnmatch.fnmatchcase(label, pattern) or fnmatch.fnmatchcase(symbol, pattern):
+                    return group
+        return None
+
+    def _resolve(self, interval, group):
+        key = (interval, group)
+        if key not in self._resolved:
+            self._resolved[key] = [profile.resolve(interval, group) for profile in self.profiles]
+        return self._resolved[key]
+
+    def compile(self, series):
+        """
+        series: các cặp (label, interval). Gọi 1 lần lúc khởi động cho toàn bộ danh sách,
+        series lạ gặp về sau được thêm vào bảng khi cần.
+        """
+        with self.lock:
+            new_rows = []
+            for label, interval in series:
+                if (label, interval) in self.row_index:
+                    continue
+                group = self.group_of(label)
+                params = self._resolve(interval, group)
+                self.row_groups.append(group)
+                self.row_params.append(params)
+                self.row_index[(label, interval)] = len(self.row_params) - 1
+                new_rows.append(params)
+            if new_rows:
+                block = np.array(new_rows, dtype=np.float64).transpose(1, 0, 2)
+                self.table = np.concatenate([self.table, block], axis=1)
+        return self
+
+    def rows(self, keys):
+        """
+        keys: list (label, interval) -> mảng chỉ số row trong table.
+        """
+        missing = [key for key in keys if key not in self.row_index]
+        if missing:
+            self.compile(missing)
+        return np.fromiter((self.row_index[key] for key in keys), dtype=np.intp, count=len(keys))
+
+    def params_for(self, label, interval):
+        """
+        Tham số của mọi profile cho 1 series: list (tên profile, ThresholdParams).
+        """
+        row = self.row_index.get((label, interval))
+        if row is None:
+            row = self.rows([(label, interval)])[0]
+        return list(zip(self.names, self.row_params[row]))
+
+    def column(self, profile, field, rows):
+        return self.table[self.names.index(profile), rows, PARAM_FIELDS.index(field)]
+
+    def max_value(self, field):
+        column = self.table[:, :, PARAM_FIELDS.index(field)]
+        if column.size == 0:
+            return max(getattr(profile.resolve(None), field) for profile in self.profiles)
+        value = column.max().item()
+        return int(value) if field in INT_FIELDS else value
+
+    def describe(self):
+        source = self.source or 'mặc định'
+        return f"{', '.join(self.names)} (chính: {self.primary}, nguồn: {source})"
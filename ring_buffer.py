@@ -0,0 +1,108 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+class SeriesRingBuffer:
+    """
+    Ring buffer OHLCV cấp phát sẵn, dung lượng cố định cho 1 (market, symbol, interval).
+    Mỗi nến được ghi 2 lần (i và i + capacity) nên N nến gần nhất luôn là một
+    slice liên tục, trả về dạng view mà không cần copy hay cấp phát lại.
+    """
+
+    def __init__(self, capacity, width=5):
+        self.capacity = capacity
+        self.width = width
+        # Lưu theo cột: data[HIGH, a:b] là vùng nhớ liên tục
+        self.data = np.zeros((width, 2 * capacity), dtype=np.float64)
+        self.times = np.zeros(2 * capacity, dtype=np.int64)
+        self.head = 0
+        self.count = 0
+
+    @property
+    def last_time(self):
+        if self.count == 0:
+            return None
+        return int(self.times[(self.head - 1) % self.capacity])
+
+    def clear(self):
+        self.head = 0
+        self.count = 0
+
+    def _write(self, times, rows):
+        k = len(times)
+        if k > self.capacity:
+            times = times[-self.capacity:]
+            rows = rows[-self.capacity:]
+            k = self.capacity
+        positions = (self.head + np.arange(k)) % self.capacity
+        self.times[positions] = times
+        self.times[positions + self.capacity] = times
+        self.data[:, positions] = rows.T
+        self.data[:, positions + self.capacity] = rows.T
+        self.head = (self.head + k) % self.capacity
+        self.count = min(self.capacity, self.count + k)
+
+    def extend(self, times, rows):
+        """
+        times: open_time (int64), rows: mảng (k, width). Nến cuối đang chạy (cùng open_time)
+        được ghi đè, nến cũ hơn bị bỏ qua, chỉ nến mới được thêm vào.
+        """
+        last_time = self.last_time
+        if last_time is not None:
+            same = np.flatnonzero(times == last_time)
+            if len(same):
+                last_index = (self.head - 1) % self.capacity
+                self.data[:, last_index] = rows[same[-1]]
+                self.data[:, last_index + self.capacity] = rows[same[-1]]
+            newer = times > last_time
+            times = times[newer]
+            rows = rows[newer]
+        if len(times):
+            self._write(times, rows)
+
+    def latest(self, n=None):
+        """
+        View (width, n) của n nến gần nhất, theo thứ tự thời gian.
+        """
+        n = self.count if n is None else min(n, self.count)
+        end = (self.head - 1) % self.capacity + self.capacity + 1
+        return self.data[:, end - n:end]
+
+    def latest_times(self, n=None):
+        n = self.count if n is None else min(n, self.count)
+        end = (self.head - 1) % self.capacity + self.capacity + 1
+        return self.times[end - n:end]
+
+
+class SeriesBufferPool:
+    """
+    Tập ring buffer theo key (market, symbol, interval). Số series bị chặn bởi
+    max_series (bỏ series lâu không dùng nhất), nên bộ nhớ không tăng theo thời gian chạy.
+    """
+
+    def __init__(self, capacity, max_series=20000):
+        self.capacity = capacity
+        self.max_series = max_series
+        self.buffers = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            buffer = self.buffers.get(key)
+            if buffer is None:
+                buffer = SeriesRingBuffer(self.capacity)
+                self.buffers[key] = buffer
+                while len(self.buffers) > self.max_series:
+                    self.buffers.popitem(last=False)
+            else:
+                self.buffers.move_to_end(key)
+            return buffer
+
+    def __len__(self):
+        return len(self.buffers)
+
+    def nbytes(self):
+        with self.lock:
+            return sum(b.data.nbytes + b.times.nbytes for b in self.buffers.values())
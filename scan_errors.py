@@ -0,0 +1,142 @@
+import re
+import time
+
+
+class ScanError(Exception):
+    """
+    Lỗi khi quét một (market, symbol, interval). transient=True nghĩa là có thể
+    thử lại (timeout, mất kết nối, rate limit, lỗi 5xx). retry_after: số giây
+    server yêu cầu chờ (Retry-After hoặc thời điểm hết ban), None nếu không có.
+    """
+
+    reason = 'error'
+    transient = False
+
+    def __init__(self, symbol, interval, market='spot', message=''):
+        super().__init__(message)
+        self.symbol = symbol
+        self.interval = interval
+        self.market = market
+        self.message = message
+        self.attempts = 1
+        self.retry_after = None
+
+    def to_dict(self):
+        # Dạng JSON để worker gửi lỗi về coordinator qua hàng đợi file
+        return {
+            'reason': self.reason,
+            'symbol': self.symbol,
+            'interval': self.interval,
+            'market': self.market,
+            'message': self.message,
+            'attempts': self.attempts,
+            'retry_after': self.retry_after,
+        }
+
+    @staticmethod
+    def from_dict(data):
+        error_class = ERROR_TYPES.get(data.get('reason'), ScanError)
+        error = error_class(data['symbol'], data['interval'], data['market'], data.get('message', ''))
+        error.attempts = data.get('attempts', 1)
+        error.retry_after = data.get('retry_after')
+        return error
+
+    def to_row(self):
+        return {
+            'Market': self.market,
+            'Tên': self.symbol,
+            'Interval': self.interval,
+            'Lỗi': self.reason,
+            'Chi tiết': self.message[:200],
+            'Số lần thử': self.attempts,
+        }
+
+
+class TransientFetchError(ScanError):
+    reason = 'transient'
+    transient = True
+
+
+class IpBannedError(ScanError):
+    """
+    HTTP 418: IP bị ban vì vượt rate limit. Không retry, gọi tiếp chỉ kéo dài thời gian ban.
+    """
+
+    reason = 'ip_banned'
+
+
+class InvalidSymbolError(ScanError):
+    reason = 'invalid_symbol'
+
+
+class InsufficientHistoryError(ScanError):
+    reason = 'insufficient_history'
+
+
+class ProcessingError(ScanError):
+    reason = 'processing'
+
+
+class FetchError(ScanError):
+    reason = 'fetch'
+
+
+ERROR_TYPES = {
+    cls.reason: cls
+    for cls in (TransientFetchError, IpBannedError, InvalidSymbolError, InsufficientHistoryError, ProcessingError, FetchError)
+}
+
+TRANSIENT_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+IP_BANNED_STATUS_CODE = 418
+INVALID_SYMBOL_CODES = {-1121}
+BANNED_UNTIL = re.compile(r'banned until (\d{13})')
+
+
+def retry_after_seconds(exc, response=None):
+    """
+    Số giây cần chờ theo header Retry-After, hoặc theo 'IP banned until <ms>' trong body.
+    """
+    headers = getattr(response, 'headers', None) or {}
+    value = headers.get('Retry-After')
+    if value:
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+    text = getattr(response, 'text', '')
+    match = BANNED_UNTIL.search(f'{exc} {text if isinstance(text, str) else ""}')
+    if match:
+        return max(0.0, int(match.group(1)) / 1000 - time.time())
+    return None
+
+
+def classify_fetch_error(exc, symbol, interval, market='spot'):
+    import requests
+
+    message = f'{type(exc).__name__}: {exc}'
+
+    if isinstance(exc, (requests.exceptions.Timeout, requests.exceptions.ConnectionError,
+                        TimeoutError, ConnectionError)):
+        return TransientFetchError(symbol, interval, market, message)
+    if isinstance(exc, FileNotFoundError):
+        return InvalidSymbolError(symbol, interval, market, message)
+
+    # BinanceAPIException có status_code/code, requests.HTTPError có response
+    status_code = getattr(exc, 'status_code', None)
+    response = getattr(exc, 'response', None)
+    if status_code is None and response is not None:
+        status_code = getattr(response, 'status_code', None)
+
+    if getattr(exc, 'code', None) in INVALID_SYMBOL_CODES:
+        return InvalidSymbolError(symbol, interval, market, message)
+    if status_code == IP_BANNED_STATUS_CODE:
+        error = IpBannedError(symbol, interval, market, message)
+        error.retry_after = retry_after_seconds(exc, response)
+        return error
+    if status_code in TRANSIENT_STATUS_CODES:
+        error = TransientFetchError(symbol, interval, market, message)
+        error.retry_after = retry_after_seconds(exc, response)
+        return error
+    if status_code == 400 and 'symbol' in str(exc).lower():
+        return InvalidSymbolError(symbol, interval, market, message)
+    return FetchError(symbol, interval, market, message)
@@ -0,0 +1,377 @@
+import os
+import json
+import time
+import bisect
+import hashlib
+import argparse
+import threading
+import multiprocessing
+
+# Worker cập nhật mtime của job đang chạy mỗi HEARTBEAT_INTERVAL giây, job không có
+# heartbeat quá STALE_AFTER giây được coi là worker đã chết
+HEARTBEAT_INTERVAL = 5
+STALE_AFTER = 4 * HEARTBEAT_INTERVAL
+
+
+class ConsistentHashRing:
+    """
+    Consistent hashing cho danh sách symbol: thêm/bớt shard chỉ làm di chuyển
+    phần symbol của shard đó, các shard khác giữ nguyên.
+    """
+
+    def __init__(self, nodes, replicas=100):
+        self.replicas = replicas
+        self.ring = []
+        for node in nodes:
+            for i in range(replicas):
+                self.ring.append((self._hash(f'{node}#{i}'), node))
+        self.ring.sort()
+        self.keys = [h for h, _ in self.ring]
+
+    @staticmethod
+    def _hash(key):
+        return int(hashlib.md5(key.encode('utf-8')).hexdigest()[:16], 16)
+
+    def node_for(self, key):
+        index = bisect.bisect(self.keys, self._hash(key)) % len(self.keys)
+        return self.ring[index][1]
+
+    def assign(self, keys):
+        shards = {}
+        for key in keys:
+            shards.setdefault(self.node_for(key), []).append(key)
+        return shards
+
+
+def _json_default(value):
+    # numpy scalar (np.float64, np.int64, ...) -> số Python
+    if hasattr(value, 'item'):
+        return value.item()
+    raise TypeError(f'Không serialize được {type(value).__name__}')
+
+
+def encode_partial(results, failures):
+    return {
+        'results': [{**r, 'rsi_last5': [float(v) for v in r['rsi_last5']]} for r in results],
+        'failures': [f.to_dict() for f in failures],
+    }
+
+
+def decode_partial(partial):
+    import pandas as pd
+    from scan_errors import ScanError
+
+    results = [{**r, 'rsi_last5': pd.Series(r['rsi_last5'], dtype='float64')} for r in partial['results']]
+    failures = [ScanError.from_dict(f) for f in partial['failures']]
+    return results, failures
+
+
+class FileJobQueue:
+    """
+    Hàng đợi job dựa trên thư mục (có thể đặt trên ổ chia sẻ giữa nhiều máy).
+    Worker nhận job bằng os.rename pending -> claimed nên mỗi job chỉ một worker lấy được.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.pending_dir = os.path.join(root, 'pending')
+        self.claimed_dir = os.path.join(root, 'claimed')
+        self.results_dir = os.path.join(root, 'results')
+        for directory in (self.pending_dir, self.claimed_dir, self.results_dir):
+            os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def _atomic_write(file_path, data):
+        tmp_path = file_path + '.tmp'
+        with open(tmp_path, 'w') as file:
+            file.write(data)
+        os.replace(tmp_path, file_path)
+
+    def put(self, job_id, payload):
+        self._atomic_write(os.path.join(self.pending_dir, f'{job_id}.json'), json.dumps(payload))
+
+    def claim(self, shard=None):
+        for name in sorted(os.listdir(self.pending_dir)):
+            if not name.endswith('.json'):
+                continue
+            job_id = name[:-5]
+            if shard and not job_id.endswith(f'__{shard}'):
+                continue
+            pending_path = os.path.join(self.pending_dir, name)
+            claimed_path = os.path.join(self.claimed_dir, name)
+            try:
+                # rename giữ nguyên mtime cũ: cập nhật trước để requeue_stale không coi job vừa
+                # nhận là quá hạn
+                os.utime(pending_path)
+                os.rename(pending_path, claimed_path)
+            except OSError:
+                # Worker khác đã lấy job này trước
+                continue
+            try:
+                with open(claimed_path, 'r') as file:
+                    return job_id, json.load(file)
+            except FileNotFoundError:
+                # Job đã bị purge hoặc đưa lại pending ngay sau khi nhận
+                continue
+        return None, None
+
+    def heartbeat(self, job_id):
+        try:
+            os.utime(os.path.join(self.claimed_dir, f'{job_id}.json'))
+            return True
+        except FileNotFoundError:
+            return False
+
+    def complete(self, job_id, result):
+        """
+        result phải serialize được bằng JSON (không dùng pickle: thư mục có thể nằm trên
+        ổ chia sẻ, đọc pickle từ đó cho phép máy khác chạy code trên coordinator).
+        """
+        if not os.path.exists(os.path.join(self.claimed_dir, f'{job_id}.json')):
+            # Coordinator đã bỏ run này (quá hạn), không để lại kết quả mồ côi
+            return False
+        self._atomic_write(
+            os.path.join(self.results_dir, f'{job_id}.json'), json.dumps(result, default=_json_default)
+        )
+        try:
+            os.remove(os.path.join(self.claimed_dir, f'{job_id}.json'))
+        except FileNotFoundError:
+            pass
+        return True
+
+    def result(self, job_id):
+        file_path = os.path.join(self.results_dir, f'{job_id}.json')
+        if not os.path.exists(file_path):
+            return None
+        with open(file_path, 'r') as file:
+            return json.load(file)
+
+    def discard_result(self, job_id):
+        try:
+            os.remove(os.path.join(self.results_dir, f'{job_id}.json'))
+        except FileNotFoundError:
+            pass
+
+    def purge(self, prefix):
+        """
+        Xoá mọi job đang chờ, đang chạy và kết quả chưa lấy có job_id bắt đầu bằng prefix.
+        """
+        removed = 0
+        for directory in (self.pending_dir, self.claimed_dir, self.results_dir):
+            for name in os.listdir(directory):
+                if name.startswith(prefix):
+                    try:
+                        os.remove(os.path.join(directory, name))
+                        removed += 1
+                    except FileNotFoundError:
+                        continue
+        return removed
+
+    def requeue_stale(self, max_age):
+        """
+        Đưa lại vào pending các job không có heartbeat quá max_age giây (worker chết giữa chừng).
+        """
+        now = time.time()
+        requeued = 0
+        for name in os.listdir(self.claimed_dir):
+            claimed_path = os.path.join(self.claimed_dir, name)
+            try:
+                if now - os.path.getmtime(claimed_path) > max_age:
+                    os.rename(claimed_path, os.path.join(self.pending_dir, name))
+                    requeued += 1
+            except FileNotFoundError:
+                continue
+        return requeued
+
+
+def _make_analyzer():
+    from test_1 import BinanceRSIAnalyzer
+    return BinanceRSIAnalyzer()
+
+
+def _share_rate_limits(analyzer, workers_per_ip):
+    # Các worker chung 1 IP dùng chung budget weight/phút của Binance, chia đều cho từng worker
+    from kline_sources import RateLimiter
+    for source in analyzer.sources.values():
+        if source.rate_limiter is not None:
+            source.rate_limiter = RateLimiter(source.weight_per_minute / workers_per_ip)
+
+
+def run_worker(queue_dir, shard=None, once=False, poll_interval=1.0, workers_per_ip=1):
+    queue = FileJobQueue(queue_dir)
+    analyzer = _make_analyzer()
+    if workers_per_ip > 1:
+        _share_rate_limits(analyzer, workers_per_ip)
+    label = shard or 'any'
+    print(f'👷 Worker [{label}] đang chờ job trong {queue_dir}...')
+
+    while True:
+        job_id, payload = queue.claim(shard)
+        if job_id is None:
+            if once:
+                return
+            time.sleep(poll_interval)
+            continue
+
+        print(f'👷 [{label}] Nhận job {job_id}')
+        analyzer.intervals = payload['intervals']
+        analyzer.rsi_period = payload['rsi_period']
+        analyzer.analysis_mode = payload['analysis_mode']
+        analyzer.market_symbols = {market: [] for market in analyzer.markets}
+        for key in payload['symbols']:
+            market, _, symbol = key.partition(':')
+            analyzer.market_symbols.setdefault(market, []).append(symbol)
+        for market in analyzer.market_symbols:
+            if market not in analyzer.sources:
+                raise ValueError(f'Worker không bật market {market}, kiểm tra SCAN_MARKETS')
+
+        stop = threading.Event()
+        beat = threading.Thread(target=_heartbeat_loop, args=(queue, job_id, stop), daemon=True)
+        beat.start()
+        try:
+            results = analyzer._scan()
+        finally:
+            stop.set()
+            beat.join()
+
+        if queue.complete(job_id, encode_partial(results, analyzer.failures)):
+            print(f'✅ [{label}] Xong job {job_id}: {len(results)} kết quả, {len(analyzer.failures)} lỗi')
+        else:
+            print(f'🗑️ [{label}] Job {job_id} đã bị coordinator huỷ, bỏ kết quả')
+
+
+def _heartbeat_loop(queue, job_id, stop):
+    while not stop.wait(HEARTBEAT_INTERVAL):
+        if not queue.heartbeat(job_id):
+            return
+
+
+def _local_worker(queue_dir, workers_per_ip):
+    # Worker cục bộ nhận job của mọi shard, nên số worker không cần bằng số shard
+    run_worker(queue_dir, workers_per_ip=workers_per_ip)
+
+
+def run_coordinator(queue_dir, shards, intervals, rsi_period, analysis_mode,
+                    every=None, timeout=600, local_workers=0, api_port=None, api_host='127.0.0.1'):
+    queue = FileJobQueue(queue_dir)
+    analyzer = _make_analyzer()
+    analyzer.intervals = intervals
+    analyzer.rsi_period = rsi_period
+    analyzer.analysis_mode = analysis_mode
+
+    if api_port:
+        from api_server import ResultStore, ResultApiServer
+        analyzer.result_store = ResultStore()
+        ResultApiServer(analyzer.result_store, api_host, api_port).start_in_thread()
+
+    shard_names = [f'shard-{i}' for i in range(shards)]
+    ring = ConsistentHashRing(shard_names)
+
+    processes = []
+    for i in range(local_workers):
+        process = multiprocessing.Process(
+            target=_local_worker, args=(queue_dir, local_workers), daemon=True
+        )
+        process.start()
+        processes.append(process)
+
+    try:
+        while True:
+            started_at = time.time()
+            run_id = time.strftime('%Y%m%d%H%M%S')
+
+            keys = [
+                f'{market}:{symbol}'
+                for market in analyzer.markets
+                for symbol in analyzer.market_symbols[market]
+            ]
+            assignment = ring.assign(keys)
+            job_ids = []
+            for shard, shard_keys in assignment.items():
+                job_id = f'{run_id}__{shard}'
+                queue.put(job_id, {
+                    'symbols': shard_keys,
+                    'intervals': intervals,
+                    'rsi_period': rsi_period,
+                    'analysis_mode': analysis_mode,
+                })
+                job_ids.append(job_id)
+            print(f'📤 Run {run_id}: {len(keys)} symbol chia vào {len(job_ids)} shard')
+
+            merged = {}
+            deadline = time.time() + timeout
+            while len(merged) < len(job_ids) and time.time() < deadline:
+                for job_id in job_ids:
+                    if job_id not in merged:
+                        partial = queue.result(job_id)
+                        if partial is not None:
+                            merged[job_id] = partial
+                            queue.discard_result(job_id)
+                            print(f'📥 {job_id}: {len(partial["results"])} kết quả')
+                queue.requeue_stale(max_age=STALE_AFTER)
+                time.sleep(0.5)
+
+            missing = [job_id for job_id in job_ids if job_id not in merged]
+            if missing:
+                print(f'⚠️ Hết thời gian chờ, thiếu {len(missing)} shard: {", ".join(missing)}')
+                # Bỏ hẳn run quá hạn để worker không quét lại job cũ và không sót file kết quả
+                removed = queue.purge(f'{run_id}__')
+                print(f'🗑️ Đã xoá {removed} job/kết quả còn sót của run {run_id}')
+
+            results = []
+            analyzer.failures = []
+            for partial in merged.values():
+                partial_results, partial_failures = decode_partial(partial)
+                results.extend(partial_results)
+                analyzer.failures.extend(partial_failures)
+            analyzer.recovered_count = 0
+            analyzer._print_failures()
+            analyzer._report(results)
+
+            if not every:
+                break
+            time.sleep(max(0, every - (time.time() - started_at)))
+    finally:
+        for process in processes:
+            process.terminate()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Quét RSI phân tán theo shard')
+    subparsers = parser.add_subparsers(dest='role', required=True)
+
+    coordinator = subparsers.add_parser('coordinator')
+    coordinator.add_argument('--queue-dir', default='scan_queue')
+    coordinator.add_argument('--shards', type=int, default=4)
+    coordinator.add_argument('--intervals', nargs='+', default=['15m', '1h', '4h', '1d'])
+    coordinator.add_argument('--rsi-period', type=int, default=14)
+    coordinator.add_argument('--mode', type=int, default=3, choices=[1, 2, 3])
+    coordinator.add_argument('--every', type=int, help='Lặp lại mỗi N giây (ví dụ 300)')
+    coordinator.add_argument('--timeout', type=int, default=600)
+    coordinator.add_argument('--local-workers', type=int, default=0,
+                             help='Chạy sẵn N worker bằng multiprocessing trên máy này '
+                                  '(chung IP nên mỗi worker dùng 1/N rate limit)')
+    coordinator.add_argument('--api-port', type=int, help='Phục vụ kết quả đã gộp qua HTTP/JSON')
+    coordinator.add_argument('--api-host', default='127.0.0.1',
+                             help='Địa chỉ bind của API, mặc định chỉ máy local')
+
+    worker = subparsers.add_parser('worker')
+    worker.add_argument('--queue-dir', default='scan_queue')
+    worker.add_argument('--shard', help='Chỉ nhận job của shard này, ví dụ shard-0')
+    worker.add_argument('--once', action='store_true', help='Thoát khi hết job')
+    worker.add_argument('--workers-per-ip', type=int, default=1,
+                        help='Số worker chạy chung IP này, mỗi worker dùng 1/N rate limit')
+
+    args = parser.parse_args()
+    if args.role == 'coordinator':
+        run_coordinator(
+            args.queue_dir, args.shards, args.intervals, args.rsi_period, args.mode,
+            every=args.every, timeout=args.timeout, local_workers=args.local_workers,
+            api_port=args.api_port, api_host=args.api_host
+        )
+    else:
+        run_worker(args.queue_dir, args.shard, once=args.once, workers_per_ip=args.workers_per_ip)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+import os
+import gzip
+import json
+import time
+import argparse
+import threading
+from datetime import datetime, timezone, timedelta
+
+from api_server import flatten_signals
+
+BEARISH_TYPES = {'rsi_high', 'bearish', 'hidden_bearish'}
+
+
+def day_of(ts_ms):
+    return datetime.fromtimestamp(ts_ms / 1000, tz=timezone.utc).strftime('%Y-%m-%d')
+
+
+class SignalJournal:
+    """
+    Nhật ký tín hiệu append-only, nén gzip. Mỗi record được ghi vào file theo ngày UTC
+    (chỉ mục thời gian) và file theo symbol (chỉ mục symbol). Chỉ ghi khi tín hiệu mới
+    xuất hiện hoặc đổi giai đoạn, nên timeline cho biết lúc phân kỳ bắt đầu và lúc được xác nhận.
+    """
+
+    def __init__(self, directory='signal_journal', cache_days=64):
+        self.directory = directory
+        self.symbol_dir = os.path.join(directory, 'by_symbol')
+        self.state_file = os.path.join(directory, 'state.json')
+        self.outcomes_file = os.path.join(directory, 'outcomes.json')
+        self.cache_days = cache_days
+        self.lock = threading.Lock()
+        self._state = None
+        self._outcomes = None
+        self._cache = {}
+
+    def _load_json(self, file_path):
+        if not os.path.exists(file_path):
+            return {}
+        with open(file_path, 'r') as file:
+            return json.load(file)
+
+    def _save_json(self, file_path, data):
+        tmp_path = file_path + '.tmp'
+        with open(tmp_path, 'w') as file:
+            json.dump(data, file)
+        os.replace(tmp_path, file_path)
+
+    def _ensure_loaded(self):
+        if self._state is None:
+            os.makedirs(self.symbol_dir, exist_ok=True)
+            self._state = self._load_json(self.state_file)
+
+    def _segment_path(self, day):
+        return os.path.join(self.directory, f'{day}.jsonl.gz')
+
+    def _symbol_path(self, symbol):
+        return os.path.join(self.symbol_dir, f"{symbol.replace(':', '__')}.jsonl.gz")
+
+    @staticmethod
+    def _append(file_path, records):
+        # Mỗi lần ghi là 1 gzip member mới, gzip đọc nối tiếp được nhiều member
+        with gzip.open(file_path, 'at', encoding='utf-8') as file:
+            file.write(''.join(json.dumps(r, ensure_ascii=False) + '\n' for r in records))
+
+    @staticmethod
+    def _read(file_path):
+        if not os.path.exists(file_path):
+            return []
+        with gzip.open(file_path, 'rt', encoding='utf-8') as file:
+            return [json.loads(line) for line in file if line.strip()]
+
+    def record(self, results, processed_data, ts=None, signal_types=None):
+        """
+        Ghi các tín hiệu mới/đổi giai đoạn của 1 lần quét. Trả về list record đã ghi.
+        Chỉ các (symbol, interval) quét thành công trong results và các loại tín hiệu
+        trong signal_types (None = mọi loại) được coi là đã kiểm tra; tín hiệu của series
+        bị lỗi, khung không quét hay mode không bật vẫn giữ trong state.
+        """
+        ts = int((ts or time.time()) * 1000)
+        by_key = {(r['symbol'], r['interval']): r for r in results}
+
+        with self.lock:
+            self._ensure_loaded()
+            active = {}
+            records = []
+            for signal in flatten_signals(processed_data):
+                key = f"{signal['symbol']}|{signal['interval']}|{signal['type']}"
+                active[key] = signal['stage']
+                if self._state.get(key) == signal['stage']:
+                    continue
+                result = by_key.get((signal['symbol'], signal['interval']), {})
+                records.append({
+                    'ts': ts,
+                    'symbol': signal['symbol'],
+                    'interval': signal['interval'],
+                    'type': signal['type'],
+                    'stage': signal['stage'],
+                    'rsi': result.get('current_rsi'),
+                    'price': result.get('current_price'),
+                })
+
+            if records:
+                self._append(self._segment_path(day_of(ts)), records)
+                by_symbol = {}
+                for r in records:
+                    by_symbol.setdefault(r['symbol'], []).append(r)
+                for symbol, symbol_records in by_symbol.items():
+                    self._append(self._symbol_path(symbol), symbol_records)
+
+            # Tín hiệu biến mất khỏi series đã quét thì xoá khỏi state để lần xuất hiện sau được ghi lại
+            state = {}
+            for key, stage in self._state.items():
+                symbol, interval, signal_type = key.rsplit('|', 2)
+                checked = (symbol, interval) in by_key and (signal_types is None or signal_type in signal_types)
+                if not checked:
+                    state[key] = stage
+            state.update(active)
+            self._state = state
+            self._save_json(self.state_file, self._state)
+        return records
+
+    def _read_day(self, day):
+        file_path = self._segment_path(day)
+        if not os.path.exists(file_path):
+            return []
+        size = os.path.getsize(file_path)
+        cached = self._cache.get(day)
+        if cached and cached[0] == size:
+            return cached[1]
+        records = self._read(file_path)
+        self._cache[day] = (size, records)
+        while len(self._cache) > self.cache_days:
+            self._cache.pop(next(iter(self._cache)))
+        return records
+
+    def recent(self, hours=24, symbol=None, interval=None, signal_type=None, stage=None, now=None):
+        now_ms = int((now or time.time()) * 1000)
+        since_ms = now_ms - int(hours * 3600 * 1000)
+        start = datetime.fromtimestamp(since_ms / 1000, tz=timezone.utc).date()
+        end = datetime.fromtimestamp(now_ms / 1000, tz=timezone.utc).date()
+
+        with self.lock:
+            self._ensure_loaded()
+            records = []
+            day = start
+            while day <= end:
+                for r in self._read_day(day.strftime('%Y-%m-%d')):
+                    if since_ms <= r['ts'] <= now_ms:
+                        records.append(r)
+                day += timedelta(days=1)
+        return self._filter(records, symbol, interval, signal_type, stage)
+
+    def timeline(self, symbol, interval=None, signal_type=None):
+        with self.lock:
+            self._ensure_loaded()
+            records = self._read(self._symbol_path(symbol))
+        return self._filter(records, None, interval, signal_type, None)
+
+    @staticmethod
+    def _filter(records, symbol, interval, signal_type, stage):
+        return [
+            r for r in records
+            if (symbol is None or r['symbol'] == symbol)
+            and (interval is None or r['interval'] == interval)
+            and (signal_type is None or r['type'] == signal_type)
+            and (stage is None or r['stage'] == stage.upper())
+        ]
+
+    def accuracy_stats(self, price_at, horizon_hours=24, lookback_days=30, now=None, max_lookups=200):
+        """
+        Độ chính xác sau horizon_hours của tín hiệu trong lookback_days: giá tại
+        ts + horizon_hours (price_at(symbol, interval, ts_ms), None nếu chưa lấy được)
+        có đi đúng hướng so với giá lúc báo không. Chỉ tính RSI cực trị và phân kỳ
+        CONFIRMED. Giá tại horizon được lưu vào outcomes.json nên mỗi tín hiệu chỉ tra
+        1 lần; mỗi lần gọi tra tối đa max_lookups tín hiệu mới.
+        """
+        now = now or time.time()
+        horizon_ms = int(horizon_hours * 3600 * 1000)
+        cutoff_ms = int(now * 1000) - horizon_ms
+        records = self.recent(hours=lookback_days * 24, now=now)
+
+        with self.lock:
+            if self._outcomes is None:
+                self._outcomes = self._load_json(self.outcomes_file)
+            outcomes = self._outcomes
+
+        stats = {}
+        lookups = 0
+        changed = False
+        for r in records:
+            if r['ts'] > cutoff_ms or not r.get('price') or r['stage'] not in ('CONFIRMED', '-'):
+                continue
+            key = f"{r['ts']}|{r['symbol']}|{r['interval']}|{r['type']}|{horizon_hours}"
+            price = outcomes.get(key)
+            if price is None:
+                if lookups >= max_lookups:
+                    continue
+                lookups += 1
+                price = price_at(r['symbol'], r['interval'], r['ts'] + horizon_ms)
+                if not price:
+                    continue
+                outcomes[key] = price
+                changed = True
+
+            change = (price / r['price'] - 1) * 100
+            hit = change < 0 if r['type'] in BEARISH_TYPES else change > 0
+            row = stats.setdefault((r['type'], r['interval']), {'count': 0, 'hits': 0, 'change_sum': 0.0})
+            row['count'] += 1
+            row['hits'] += int(hit)
+            row['change_sum'] += change
+
+        if changed:
+            # Bỏ kết quả của tín hiệu đã ra khỏi cửa sổ lookback
+            oldest_ms = int((now - lookback_days * 86400) * 1000)
+            with self.lock:
+                self._outcomes = {k: v for k, v in outcomes.items() if int(k.split('|', 1)[0]) >= oldest_ms}
+                self._save_json(self.outcomes_file, self._outcomes)
+
+        return {
+            key: {
+                'count': row['count'],
+                'hit_rate': round(row['hits'] / row['count'] * 100, 1),
+                'avg_change_pct': round(row['change_sum'] / row['count'], 2),
+            }
+            for key, row in sorted(stats.items())
+        }
+
+
+def _print_records(records):
+    for r in records:
+        ts = datetime.fromtimestamp(r['ts'] / 1000, tz=timezone.utc).strftime('%Y-%m-%d %H:%M')
+        print(f"{ts} | {r['symbol']:<20} {r['interval']:<4} {r['type']:<15} {r['stage']:<10} "
+              f"RSI={r['rsi']} Price={r['price']}")
+    print(f'({len(records)} record)')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Tra cứu nhật ký tín hiệu RSI')
+    parser.add_argument('--dir', default=os.getenv('SIGNAL_JOURNAL_DIR', 'signal_journal'))
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    recent = subparsers.add_parser('recent')
+    recent.add_argument('--hours', type=float, default=24)
+    recent.add_argument('--symbol')
+    recent.add_argument('--interval')
+    recent.add_argument('--type')
+    recent.add_argument('--stage')
+
+    timeline = subparsers.add_parser('timeline')
+    timeline.add_argument('symbol')
+    timeline.add_argument('--interval')
+    timeline.add_argument('--type')
+
+    args = parser.parse_args()
+    journal = SignalJournal(args.dir)
+    started_at = time.perf_counter()
+    if args.command == 'recent':
+        records = journal.recent(args.hours, args.symbol, args.interval, args.type, args.stage)
+    else:
+        records = journal.timeline(args.symbol, args.interval, args.type)
+    elapsed = (time.perf_counter() - started_at) * 1000
+    _print_records(records)
+    print(f'⏱️ {elapsed:.1f} ms')
+
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,38 @@
 import os
 import json
+import time
+import threading
 import concurrent.futures
 import pandas as pd
 import numpy as np
 import ta
-import gspread
-import requests
-from binance.client import Client
 from dotenv import load_dotenv
-from openpyxl.styles import Border, Side, Font, Alignment, PatternFill
-from oauth2client.service_account import ServiceAccountCredentials
 from enum import Enum
+from market_breadth import MarketBreadth
+from kline_sources import MARKETS, create_source
+from ring_buffer import SeriesBufferPool
+from indicators import ohlcv_buffer, compute_indicators, HIGH, LOW, CLOSE
+from pivots import PivotIndex
+from profiles import ProfileSet, ThresholdParams
+from confluence import ConfluenceScorer
+from signal_journal import SignalJournal
+from scan_errors import ScanError, IpBannedError, InsufficientHistoryError, ProcessingError, classify_fetch_error
 
 load_dotenv()
 
 ALLOWED_INTERVALS = ["5m", "15m", "30m", "1h", "4h", "1d", "1w"]
 
+INDICATOR_FILTERS = ['stoch_rsi', 'mfi', 'ema_trend', 'volume']
+
+DIVERGENCE_KINDS = ['bullish', 'bearish', 'hidden_bullish', 'hidden_bearish']
+DIVERGENCE_STAGES = ['confirmed', 'developing', 'forming']
+DIVERGENCE_LABELS = {
+    'bullish': ('🟢', 'BULLISH DIV'),
+    'bearish': ('🔴', 'BEARISH DIV'),
+    'hidden_bullish': ('🟢 Hidden', 'HIDDEN BULLISH DIV'),
+    'hidden_bearish': ('🔴 Hidden', 'HIDDEN BEARISH DIV'),
+}
+
 
 class DivergencePhase(Enum):
     IDLE = "IDLE"
@@ -53,7 +70,7 @@ def ask_intervals():
 def ask_analysis_mode():
     while True:
         print("\n" + "="*50)
-        print("1. RSI cơ bản (RSI >= 80 hoặc <= 20)")
+        print("1. RSI cơ bản (RSI quá mua / quá bán theo profile)")
         print("2. RSI Divergence (Phân kỳ theo rules V4)")
         print("3. Cả hai")
         print("00. Thoát")
@@ -75,11 +92,27 @@ class BinanceRSIAnalyzer:
         self.telegram_chat_id = os.getenv('TELEGRAM_CHAT_ID')
         self.google_creds_json = os.getenv('GOOGLE_SHEET_CREDENTIALS')
         
-        self.client = Client(self.api_key, self.api_secret)
-        self.symbols = self._load_symbols()
+        self.dry_run = os.getenv('DRY_RUN') == '1'
+
+        # Client Binance chỉ được tạo (và ping) khi có request đầu tiên
+        self._client = None
+        self._client_lock = threading.Lock()
+        self.markets = [m.strip() for m in os.getenv('SCAN_MARKETS', 'spot').split(',') if m.strip()]
+        for market in self.markets:
+            if market not in MARKETS:
+                raise ValueError(f'SCAN_MARKETS không hợp lệ: {market} (cho phép: {", ".join(MARKETS)})')
+        self.replay_dir = os.getenv('REPLAY_DIR', 'replay_data')
+        self.sources = {
+            market: create_source(market, self._get_client, self.replay_dir)
+            for market in self.markets
+        }
+        self.market_symbols = {market: self._load_symbols(market) for market in self.markets}
         self.intervals = ['15m', '1h', '4h', '1d']
         self.rsi_period = 14
         self.excel_file = 'rsi_filtered_data.xlsx'
+        self.matrix_file = 'rsi_matrix.npz'
+        self.heatmap_file = 'rsi_heatmap.png'
+        self.breadth_file = 'rsi_breadth.csv'
         self.analysis_mode = 1
 
         self.RSI_OVERBOUGHT = 80
@@ -89,42 +122,104 @@ class BinanceRSIAnalyzer:
         self.RSI_CONFIRM_BEARISH = 70
         self.RSI_CONFIRM_BULLISH = 30
         
+        self.retry_attempts = 3
+        self.retry_backoff = 2
+        # Market bị ban IP (HTTP 418): {market: thời điểm hết ban}, dừng gọi API market đó tới lúc hết ban
+        self.ban_cooldown = 120
+        self.banned_until = {}
+        self.failures = []
+        self.recovered_count = 0
+
+        # Bộ lọc phụ cho tín hiệu RSI/phân kỳ, ví dụ INDICATOR_FILTERS=stoch_rsi,mfi
+        self.indicator_filters = [f.strip() for f in os.getenv('INDICATOR_FILTERS', '').split(',') if f.strip()]
+        for name in self.indicator_filters:
+            if name not in INDICATOR_FILTERS:
+                raise ValueError(f'INDICATOR_FILTERS không hợp lệ: {name} (cho phép: {", ".join(INDICATOR_FILTERS)})')
+        self.MFI_OVERBOUGHT = 70
+        self.MFI_OVERSOLD = 30
+        self.VOLUME_CONFIRM_RATIO = 1.5
+
+        self.confluence_scorer = ConfluenceScorer(min_intervals=2, chart_url=self._chart_url)
+
+        # Gán ResultStore (api_server.py) để _report publish kết quả cho HTTP API
+        self.result_store = None
+        self.journal = SignalJournal(os.getenv('SIGNAL_JOURNAL_DIR', 'signal_journal'))
+
         self.scan_candles = 100
         self.min_candle_distance = 24
         self.max_candle_distance = 34
 
-    def _load_symbols(self):
+        # Profile ngưỡng theo interval / nhóm symbol (rsi_profiles.toml), biên dịch sẵn
+        # cho mọi (symbol, interval) để xử lý theo lô bằng mảng tham số
+        self.profiles = ProfileSet.from_env(self.default_params._asdict(), os.path.dirname(os.path.abspath(__file__)))
+        self.profiles.compile(
+            (self._label(symbol, market), interval)
+            for market in self.markets
+            for symbol in self.market_symbols[market]
+            for interval in ALLOWED_INTERVALS
+        )
+
+        self.kline_limit = max(200, self.profiles.max_value('scan_candles') + 100)
+        self.incremental_limit = 10
+        self.buffer_pool = SeriesBufferPool(self.kline_limit)
+
+    def _get_client(self):
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    from binance.client import Client
+                    self._client = Client(self.api_key, self.api_secret)
+        return self._client
+
+    @property
+    def client(self):
+        return self._get_client()
+
+    @property
+    def default_params(self):
+        return ThresholdParams(
+            self.RSI_OVERBOUGHT, self.RSI_OVERSOLD, self.RSI_UPPER_MID, self.RSI_LOWER_MID,
+            self.RSI_CONFIRM_BEARISH, self.RSI_CONFIRM_BULLISH,
+            self.scan_candles, self.min_candle_distance, self.max_candle_distance
+        )
+
+    def _load_symbols(self, market=None):
         current_dir = os.path.dirname(os.path.abspath(__file__))
         file_path = os.path.join(current_dir, 'textcoin.txt')
+        # Cho phép danh sách riêng cho từng market, ví dụ textcoin_coinm.txt
+        if market:
+            market_file = os.path.join(current_dir, f'textcoin_{market}.txt')
+            if os.path.exists(market_file):
+                file_path = market_file
         with open(file_path, 'r') as file:
-            return [line.strip() for line in file.readlines()]
+            return [line.strip() for line in file.readlines() if line.strip()]
+
+    def _label(self, symbol, market):
+        return symbol if market == 'spot' else f'{market}:{symbol}'
+
+    def _chart_url(self, label):
+        market, _, symbol = label.rpartition(':')
+        return self.sources[market or 'spot'].chart_url(symbol)
 
     def _calculate_rsi(self, close_prices, window):
         rsi = ta.momentum.RSIIndicator(close_prices, window=window).rsi()
         return rsi.dropna()
 
-    def _is_local_peak(self, rsi_array, index):
-        if index <= 0 or index >= len(rsi_array) - 1:
-            return False
-        return rsi_array[index] > rsi_array[index - 1] and rsi_array[index] > rsi_array[index + 1]
-
-    def _is_local_bottom(self, rsi_array, index):
-        if index <= 0 or index >= len(rsi_array) - 1:
-            return False
-        return rsi_array[index] < rsi_array[index - 1] and rsi_array[index] < rsi_array[index + 1]
-
-    def _detect_bearish_divergence_v4(self, rsi_array, high_array):
+    def _detect_bearish_divergence_v4(self, rsi_array, high_array, pivots=None, params=None):
         """
         Bearish Divergence: So sánh giá HIGH tại các đỉnh RSI
         - Giá HIGH tăng nhưng RSI giảm = Bearish Divergence
         """
+        p = params or self.default_params
         n = len(rsi_array)
-        if n < self.scan_candles:
+        if n < p.scan_candles:
             return None
 
-        rsi = rsi_array[-self.scan_candles:]
-        highs = high_array[-self.scan_candles:]
+        rsi = rsi_array[-p.scan_candles:]
+        highs = high_array[-p.scan_candles:]
         n = len(rsi)
+        if pivots is None:
+            pivots = PivotIndex(rsi, highs, highs)
 
         phase = DivergencePhase.IDLE
         peak1_rsi = None
@@ -145,13 +240,13 @@ class BinanceRSIAnalyzer:
             high_val = highs[i]
 
             if phase == DivergencePhase.IDLE:
-                if rsi_val > self.RSI_OVERBOUGHT:
+                if rsi_val > p.overbought:
                     in_overbought = True
                     if temp_peak_rsi is None or rsi_val > temp_peak_rsi:
                         temp_peak_rsi = rsi_val
                         temp_peak_high = high_val
                         temp_peak_index = i
-                elif in_overbought and rsi_val <= self.RSI_OVERBOUGHT:
+                elif in_overbought and rsi_val <= p.overbought:
                     peak1_rsi = temp_peak_rsi
                     peak1_high = temp_peak_high
                     peak1_index = temp_peak_index
@@ -162,12 +257,12 @@ class BinanceRSIAnalyzer:
                     temp_peak_index = None
 
             elif phase == DivergencePhase.FORMING:
-                if rsi_val < self.RSI_LOWER_MID:
+                if rsi_val < p.lower_mid:
                     phase = DivergencePhase.IDLE
                     peak1_rsi = None
                     peak1_high = None
                     peak1_index = None
-                elif rsi_val > self.RSI_OVERBOUGHT:
+                elif rsi_val > p.overbought:
                     in_overbought = True
                     temp_peak_rsi = rsi_val
                     temp_peak_high = high_val
@@ -176,19 +271,19 @@ class BinanceRSIAnalyzer:
                     peak1_rsi = None
                     peak1_high = None
                     peak1_index = None
-                elif rsi_val < self.RSI_UPPER_MID:
+                elif rsi_val < p.upper_mid:
                     phase = DivergencePhase.DEVELOPING
 
             elif phase == DivergencePhase.DEVELOPING:
                 candle_distance = i - peak1_index
                 
-                if rsi_val < self.RSI_LOWER_MID:
+                if rsi_val < p.lower_mid:
                     phase = DivergencePhase.IDLE
                     peak1_rsi = None
                     peak1_high = None
                     peak1_index = None
                     divergence_ready = False
-                elif rsi_val > self.RSI_OVERBOUGHT:
+                elif rsi_val > p.overbought:
                     in_overbought = True
                     temp_peak_rsi = rsi_val
                     temp_peak_high = high_val
@@ -198,19 +293,19 @@ class BinanceRSIAnalyzer:
                     peak1_high = None
                     peak1_index = None
                     divergence_ready = False
-                elif candle_distance > self.max_candle_distance:
+                elif candle_distance > p.max_candle_distance:
                     phase = DivergencePhase.IDLE
                     peak1_rsi = None
                     peak1_high = None
                     peak1_index = None
                     divergence_ready = False
-                elif self.min_candle_distance <= candle_distance <= self.max_candle_distance:
-                    if i >= 2 and self._is_local_peak(rsi, i - 1):
+                elif p.min_candle_distance <= candle_distance <= p.max_candle_distance:
+                    if i >= 2 and pivots.is_rsi_peak[i - 1]:
                         candidate_index = i - 1
                         candidate_rsi = rsi[candidate_index]
                         candidate_high = highs[candidate_index]
                         
-                        if self.RSI_LOWER_MID < candidate_rsi < self.RSI_OVERBOUGHT:
+                        if p.lower_mid < candidate_rsi < p.overbought:
                             # So sánh HIGH: HIGH2 > HIGH1 và RSI2 < RSI1
                             if candidate_high > peak1_high and candidate_rsi < peak1_rsi:
                                 peak2_rsi = candidate_rsi
@@ -218,7 +313,7 @@ class BinanceRSIAnalyzer:
                                 peak2_index = candidate_index
                                 divergence_ready = True
                 
-                if divergence_ready and rsi_val <= self.RSI_CONFIRM_BEARISH:
+                if divergence_ready and rsi_val <= p.confirm_bearish:
                     phase = DivergencePhase.CONFIRMED
 
         if phase == DivergencePhase.CONFIRMED:
@@ -232,18 +327,21 @@ class BinanceRSIAnalyzer:
 
         return None
 
-    def _detect_bullish_divergence_v4(self, rsi_array, low_array):
+    def _detect_bullish_divergence_v4(self, rsi_array, low_array, pivots=None, params=None):
         """
         Bullish Divergence: So sánh giá LOW tại các đáy RSI
         - Giá LOW giảm nhưng RSI tăng = Bullish Divergence
         """
+        p = params or self.default_params
         n = len(rsi_array)
-        if n < self.scan_candles:
+        if n < p.scan_candles:
             return None
 
-        rsi = rsi_array[-self.scan_candles:]
-        lows = low_array[-self.scan_candles:]
+        rsi = rsi_array[-p.scan_candles:]
+        lows = low_array[-p.scan_candles:]
         n = len(rsi)
+        if pivots is None:
+            pivots = PivotIndex(rsi, lows, lows)
 
         phase = DivergencePhase.IDLE
         bottom1_rsi = None
@@ -264,13 +362,13 @@ class BinanceRSIAnalyzer:
             low_val = lows[i]
 
             if phase == DivergencePhase.IDLE:
-                if rsi_val < self.RSI_OVERSOLD:
+                if rsi_val < p.oversold:
                     in_oversold = True
                     if temp_bottom_rsi is None or rsi_val < temp_bottom_rsi:
                         temp_bottom_rsi = rsi_val
                         temp_bottom_low = low_val
                         temp_bottom_index = i
-                elif in_oversold and rsi_val >= self.RSI_OVERSOLD:
+                elif in_oversold and rsi_val >= p.oversold:
                     bottom1_rsi = temp_bottom_rsi
                     bottom1_low = temp_bottom_low
                     bottom1_index = temp_bottom_index
@@ -281,12 +379,12 @@ class BinanceRSIAnalyzer:
                     temp_bottom_index = None
 
             elif phase == DivergencePhase.FORMING:
-                if rsi_val > self.RSI_UPPER_MID:
+                if rsi_val > p.upper_mid:
                     phase = DivergencePhase.IDLE
                     bottom1_rsi = None
                     bottom1_low = None
                     bottom1_index = None
-                elif rsi_val < self.RSI_OVERSOLD:
+                elif rsi_val < p.oversold:
                     in_oversold = True
                     temp_bottom_rsi = rsi_val
                     temp_bottom_low = low_val
@@ -295,19 +393,19 @@ class BinanceRSIAnalyzer:
                     bottom1_rsi = None
                     bottom1_low = None
                     bottom1_index = None
-                elif rsi_val > self.RSI_LOWER_MID:
+                elif rsi_val > p.lower_mid:
                     phase = DivergencePhase.DEVELOPING
 
             elif phase == DivergencePhase.DEVELOPING:
                 candle_distance = i - bottom1_index
                 
-                if rsi_val > self.RSI_UPPER_MID:
+                if rsi_val > p.upper_mid:
                     phase = DivergencePhase.IDLE
                     bottom1_rsi = None
                     bottom1_low = None
                     bottom1_index = None
                     divergence_ready = False
-                elif rsi_val < self.RSI_OVERSOLD:
+                elif rsi_val < p.oversold:
                     in_oversold = True
                     temp_bottom_rsi = rsi_val
                     temp_bottom_low = low_val
@@ -317,19 +415,19 @@ class BinanceRSIAnalyzer:
                     bottom1_low = None
                     bottom1_index = None
                     divergence_ready = False
-                elif candle_distance > self.max_candle_distance:
+                elif candle_distance > p.max_candle_distance:
                     phase = DivergencePhase.IDLE
                     bottom1_rsi = None
                     bottom1_low = None
                     bottom1_index = None
                     divergence_ready = False
-                elif self.min_candle_distance <= candle_distance <= self.max_candle_distance:
-                    if i >= 2 and self._is_local_bottom(rsi, i - 1):
+                elif p.min_candle_distance <= candle_distance <= p.max_candle_distance:
+                    if i >= 2 and pivots.is_rsi_bottom[i - 1]:
                         candidate_index = i - 1
                         candidate_rsi = rsi[candidate_index]
                         candidate_low = lows[candidate_index]
                         
-                        if self.RSI_OVERSOLD < candidate_rsi < self.RSI_UPPER_MID:
+                        if p.oversold < candidate_rsi < p.upper_mid:
                             # So sánh LOW: LOW2 < LOW1 và RSI2 > RSI1
                             if candidate_low < bottom1_low and candidate_rsi > bottom1_rsi:
                                 bottom2_rsi = candidate_rsi
@@ -337,7 +435,7 @@ class BinanceRSIAnalyzer:
                                 bottom2_index = candidate_index
                                 divergence_ready = True
                 
-                if divergence_ready and rsi_val >= self.RSI_CONFIRM_BULLISH:
+                if divergence_ready and rsi_val >= p.confirm_bullish:
                     phase = DivergencePhase.CONFIRMED
 
         if phase == DivergencePhase.CONFIRMED:
@@ -351,125 +449,272 @@ class BinanceRSIAnalyzer:
 
         return None
 
-    def _detect_divergence(self, rsi_series, high_series, low_series):
+    def _detect_hidden_bearish_divergence(self, pivots, params=None):
+        """
+        Hidden Bearish Divergence: HIGH thấp hơn nhưng RSI cao hơn tại đỉnh RSI gần nhất
+        - Dùng cặp đỉnh từ PivotIndex, không duyệt lại từng nến
+        """
+        p = params or self.default_params
+        rsi = pivots.rsi
+        highs = pivots.highs
+        earlier, last = pivots.pivot_pairs(pivots.rsi_peaks, p.min_candle_distance, p.max_candle_distance)
+        if last is None or len(rsi) - 1 - last > p.max_candle_distance:
+            return None
+        if not (p.lower_mid < rsi[last] < p.overbought) or rsi[-1] > rsi[last]:
+            return None
+
+        matches = earlier[(highs[earlier] > highs[last]) & (rsi[earlier] < rsi[last])]
+        if len(matches) == 0:
+            return None
+
+        # Xác nhận khi RSI quay về dưới đỉnh RSI thứ nhất
+        stage = 'CONFIRMED' if rsi[-1] <= rsi[matches].min() else 'DEVELOPING'
+        return {'type': 'hidden_bearish', 'stage': stage}
+
+    def _detect_hidden_bullish_divergence(self, pivots, params=None):
+        """
+        Hidden Bullish Divergence: LOW cao hơn nhưng RSI thấp hơn tại đáy RSI gần nhất
+        """
+        p = params or self.default_params
+        rsi = pivots.rsi
+        lows = pivots.lows
+        earlier, last = pivots.pivot_pairs(pivots.rsi_bottoms, p.min_candle_distance, p.max_candle_distance)
+        if last is None or len(rsi) - 1 - last > p.max_candle_distance:
+            return None
+        if not (p.oversold < rsi[last] < p.upper_mid) or rsi[-1] < rsi[last]:
+            return None
+
+        matches = earlier[(lows[earlier] < lows[last]) & (rsi[earlier] > rsi[last])]
+        if len(matches) == 0:
+            return None
+
+        stage = 'CONFIRMED' if rsi[-1] >= rsi[matches].max() else 'DEVELOPING'
+        return {'type': 'hidden_bullish', 'stage': stage}
+
+    def _detect_divergence(self, rsi_series, high_series, low_series, params=None, pivot_cache=None):
         """
         Phát hiện phân kỳ sử dụng HIGH cho bearish và LOW cho bullish
         """
-        rsi = np.array(rsi_series)
-        highs = np.array(high_series)
-        lows = np.array(low_series)
+        p = params or self.default_params
+        rsi = np.asarray(rsi_series, dtype=np.float64)
+        highs = np.asarray(high_series, dtype=np.float64)
+        lows = np.asarray(low_series, dtype=np.float64)
         
-        if len(rsi) < self.scan_candles:
+        if len(rsi) < p.scan_candles:
             return []
 
+        # Chỉ mục đỉnh/đáy dựng 1 lần cho cửa sổ scan, dùng chung cho mọi detector
+        # (và cho mọi profile có cùng scan_candles khi truyền pivot_cache)
+        pivot_cache = {} if pivot_cache is None else pivot_cache
+        pivots = pivot_cache.get(p.scan_candles)
+        if pivots is None:
+            pivots = PivotIndex(rsi[-p.scan_candles:], highs[-p.scan_candles:], lows[-p.scan_candles:])
+            pivot_cache[p.scan_candles] = pivots
+
         results = []
 
         # Bearish divergence: dùng HIGH
-        bearish = self._detect_bearish_divergence_v4(rsi, highs)
+        bearish = self._detect_bearish_divergence_v4(rsi, highs, pivots, p)
         if bearish:
             results.append(bearish)
 
         # Bullish divergence: dùng LOW
-        bullish = self._detect_bullish_divergence_v4(rsi, lows)
+        bullish = self._detect_bullish_divergence_v4(rsi, lows, pivots, p)
         if bullish:
             results.append(bullish)
 
+        for detector in (self._detect_hidden_bearish_divergence, self._detect_hidden_bullish_divergence):
+            hidden = detector(pivots, p)
+            if hidden:
+                results.append(hidden)
+
         return results
 
-    def _fetch_and_process_data(self, symbol, interval):
+    def _fetch_klines(self, symbol, interval, market, limit):
+        remaining = self.banned_until.get(market, 0) - time.time()
+        if remaining > 0:
+            raise IpBannedError(symbol, interval, market, f'Bỏ qua: IP đang bị ban, còn {remaining:.0f}s')
         try:
-            klines = self.client.get_klines(symbol=symbol, interval=interval, limit=200)
-            
-            # Lấy các loại giá từ klines
-            # klines format: [open_time, open, high, low, close, volume, ...]
-            high_prices = pd.Series([float(k[2]) for k in klines])
-            low_prices = pd.Series([float(k[3]) for k in klines])
-            close_prices = pd.Series([float(k[4]) for k in klines])
-            current_price = float(klines[-1][4])
+            return self.sources[market].get_klines(symbol, interval, limit=limit)
+        except Exception as e:
+            error = classify_fetch_error(e, symbol, interval, market)
+            if isinstance(error, IpBannedError) and self.banned_until.get(market, 0) <= time.time():
+                cooldown = error.retry_after if error.retry_after is not None else self.ban_cooldown
+                self.banned_until[market] = time.time() + cooldown
+                print(f'\n⛔ {market}: IP bị ban (HTTP 418), dừng quét market này trong {cooldown:.0f}s')
+            raise error from e
+
+    def _update_buffer(self, symbol, interval, market):
+        """
+        Nạp nến vào ring buffer của series. Khi buffer đã đầy chỉ lấy vài nến mới nhất;
+        nếu phát hiện khoảng trống thì lấy lại đủ kline_limit nến.
+        """
+        buffer = self.buffer_pool.get((market, symbol, interval))
+        warm = buffer.count >= self.kline_limit
+        klines = self._fetch_klines(symbol, interval, market, self.incremental_limit if warm else self.kline_limit)
+        open_times, rows = self._parse_klines(klines, symbol, interval, market)
+
+        if warm and len(open_times) and open_times[0] > buffer.last_time:
+            buffer.clear()
+            klines = self._fetch_klines(symbol, interval, market, self.kline_limit)
+            open_times, rows = self._parse_klines(klines, symbol, interval, market)
+        if len(open_times):
+            buffer.extend(open_times, rows)
+        return buffer
+
+    def _parse_klines(self, klines, symbol, interval, market):
+        """
+        klines format: [open_time, open, high, low, close, volume, ...]. Dòng lỗi định dạng
+        (CSV replay, REST) thành ProcessingError để chỉ symbol đó bị đánh dấu lỗi.
+        """
+        if not klines:
+            # Không có nến: cold path báo InsufficientHistoryError, warm path giữ nguyên buffer
+            return np.empty(0, dtype=np.int64), np.empty((0, 5), dtype=np.float64)
+        try:
+            open_times = np.array([int(k[0]) for k in klines], dtype=np.int64)
+            rows = ohlcv_buffer(klines).reshape(len(klines), -1)
+            if rows.shape[1] != 5:
+                raise ValueError(f'cần 6 cột open_time + OHLCV, nhận {rows.shape[1] + 1}')
+            return open_times, rows
+        except Exception as e:
+            raise ProcessingError(symbol, interval, market, f'Kline lỗi định dạng: {type(e).__name__}: {e}') from e
+
+    def _fetch_and_process_data(self, symbol, interval, market='spot'):
+        label = self._label(symbol, market)
+        profile_params = self.profiles.params_for(label, interval)
+        buffer = self._update_buffer(symbol, interval, market)
 
-            if len(close_prices) < self.rsi_period + self.scan_candles:
-                return None
+        required = self.rsi_period + max(p.scan_candles for _, p in profile_params)
+        if buffer.count < required:
+            raise InsufficientHistoryError(
+                symbol, interval, market,
+                f'Chỉ có {buffer.count} nến, cần {required}'
+            )
 
-            rsi = self._calculate_rsi(close_prices, self.rsi_period)
+        try:
+            # View liên tục trên ring buffer, không copy dữ liệu giá
+            window = buffer.latest()
+            ohlcv = window.T
+            highs = window[HIGH]
+            lows = window[LOW]
+            current_price = float(window[CLOSE, -1])
+
+            rsi = self._calculate_rsi(pd.Series(window[CLOSE], copy=False), self.rsi_period)
             
             # Align tất cả các price series với RSI
             aligned_length = len(rsi)
-            aligned_highs = high_prices.iloc[-aligned_length:].reset_index(drop=True)
-            aligned_lows = low_prices.iloc[-aligned_length:].reset_index(drop=True)
-            aligned_closes = close_prices.iloc[-aligned_length:].reset_index(drop=True)
+            aligned_highs = highs[-aligned_length:]
+            aligned_lows = lows[-aligned_length:]
             
             rsi_last5 = rsi.tail(5)
 
-            # Gọi _detect_divergence với high và low riêng biệt
-            divergences = self._detect_divergence(rsi, aligned_highs, aligned_lows)
-
-            bullish_div = None
-            bearish_div = None
-            for div in divergences:
-                if div['type'] == 'bullish':
-                    bullish_div = div
-                elif div['type'] == 'bearish':
-                    bearish_div = div
+            # Gọi _detect_divergence với high và low riêng biệt, 1 lần cho mỗi profile
+            pivot_cache = {}
+            divergences = {
+                name: {
+                    div['type']: div
+                    for div in self._detect_divergence(rsi, aligned_highs, aligned_lows, params, pivot_cache)
+                }
+                for name, params in profile_params
+            }
+            found = divergences[self.profiles.primary]
 
             return {
-                'symbol': symbol,
+                'symbol': label,
+                'market': market,
                 'interval': interval,
                 'rsi_last5': rsi_last5,
                 'current_rsi': round(rsi.iloc[-1], 2),
                 'current_price': current_price,
-                'divergence_bullish': bullish_div,
-                'divergence_bearish': bearish_div
+                'divergence_bullish': found.get('bullish'),
+                'divergence_bearish': found.get('bearish'),
+                'divergence_hidden_bullish': found.get('hidden_bullish'),
+                'divergence_hidden_bearish': found.get('hidden_bearish'),
+                'divergences': divergences,
+                'indicators': compute_indicators(ohlcv, rsi.to_numpy())
             }
         except Exception as e:
-            return None
+            raise ProcessingError(symbol, interval, market, f'{type(e).__name__}: {e}') from e
 
-    def _process_result(self, results):
+    def _passes_indicator_filters(self, result, direction):
+        """
+        direction: 'bearish' (RSI cao / phân kỳ giảm) hoặc 'bullish' (RSI thấp / phân kỳ tăng)
+        """
+        values = result.get('indicators') or {}
+        bearish = direction == 'bearish'
+
+        for name in self.indicator_filters:
+            if name == 'stoch_rsi':
+                k, d = values.get('stoch_rsi_k'), values.get('stoch_rsi_d')
+                if k is None or d is None or (k >= d if bearish else k <= d):
+                    return False
+            elif name == 'mfi':
+                mfi = values.get('mfi')
+                if mfi is None or (mfi < self.MFI_OVERBOUGHT if bearish else mfi > self.MFI_OVERSOLD):
+                    return False
+            elif name == 'ema_trend':
+                fast, slow = values.get('ema_fast'), values.get('ema_slow')
+                if fast is None or slow is None or (fast > slow if bearish else fast < slow):
+                    return False
+            elif name == 'volume':
+                ratio = values.get('volume_ratio')
+                if ratio is None or ratio < self.VOLUME_CONFIRM_RATIO:
+                    return False
+        return True
+
+    def _process_result(self, results, profile=None):
+        """
+        Lọc tín hiệu theo 1 profile (mặc định profile chính). Ngưỡng RSI của từng series
+        lấy từ bảng tham số đã biên dịch và so sánh cả lô bằng numpy.
+        """
+        profile = profile or self.profiles.primary
         output = {interval: {
             'rsi_high': [], 'rsi_low': [],
-            'div_bullish_confirmed': [], 'div_bullish_developing': [], 'div_bullish_forming': [],
-            'div_bearish_confirmed': [], 'div_bearish_developing': [], 'div_bearish_forming': []
+            **{f'div_{kind}_{stage}': [] for kind in DIVERGENCE_KINDS for stage in DIVERGENCE_STAGES}
         } for interval in self.intervals}
 
-        for result in results:
+        if not results:
+            return output
+
+        rows = self.profiles.rows([(r['symbol'], r['interval']) for r in results])
+        overbought = self.profiles.column(profile, 'overbought', rows)
+        oversold = self.profiles.column(profile, 'oversold', rows)
+        rsi_last5 = np.array([r['rsi_last5'].to_numpy()[-5:] for r in results], dtype=np.float64)
+        is_high = (rsi_last5 >= overbought[:, None]).any(axis=1)
+        is_low = (rsi_last5 <= oversold[:, None]).any(axis=1)
+
+        for i, result in enumerate(results):
             symbol = result['symbol']
             interval = result['interval']
-            rsi_last5 = result['rsi_last5']
-            chart_url = f'https://www.tradingview.com/chart/?symbol=BINANCE:{symbol}'
+            chart_url = self._chart_url(symbol)
 
             if self.analysis_mode in [1, 3]:
-                if (rsi_last5 >= self.RSI_OVERBOUGHT).any():
+                if is_high[i] and self._passes_indicator_filters(result, 'bearish'):
                     output[interval]['rsi_high'].append({
                         'Tên': symbol,
-                        'Loại': f'RSI ≥ {self.RSI_OVERBOUGHT}',
+                        'Loại': f'RSI ≥ {overbought[i]:g}',
                         'Chart URL': chart_url
                     })
-                elif (rsi_last5 <= self.RSI_OVERSOLD).any():
+                elif is_low[i] and self._passes_indicator_filters(result, 'bullish'):
                     output[interval]['rsi_low'].append({
                         'Tên': symbol,
-                        'Loại': f'RSI ≤ {self.RSI_OVERSOLD}',
+                        'Loại': f'RSI ≤ {oversold[i]:g}',
                         'Chart URL': chart_url
                     })
 
             if self.analysis_mode in [2, 3]:
-                if result['divergence_bullish']:
-                    div = result['divergence_bullish']
-                    key = f'div_bullish_{div["stage"].lower()}'
-                    output[interval][key].append({
-                        'Tên': symbol,
-                        'Loại': '🟢',
-                        'Giai đoạn': div['stage'],
-                        'Chart URL': chart_url
-                    })
-
-                if result['divergence_bearish']:
-                    div = result['divergence_bearish']
-                    key = f'div_bearish_{div["stage"].lower()}'
-                    output[interval][key].append({
-                        'Tên': symbol,
-                        'Loại': '🔴',
-                        'Giai đoạn': div['stage'],
-                        'Chart URL': chart_url
-                    })
+                found = result['divergences'][profile]
+                for kind in DIVERGENCE_KINDS:
+                    div = found.get(kind)
+                    direction = 'bullish' if kind.endswith('bullish') else 'bearish'
+                    if div and self._passes_indicator_filters(result, direction):
+                        key = f'div_{kind}_{div["stage"].lower()}'
+                        output[interval][key].append({
+                            'Tên': symbol,
+                            'Loại': DIVERGENCE_LABELS[kind][0],
+                            'Giai đoạn': div['stage'],
+                            'Chart URL': chart_url
+                        })
 
         return output
 
@@ -485,7 +730,11 @@ class BinanceRSIAnalyzer:
         message_parts = [f"🔔 <b>RSI Alert - Period {self.rsi_period}</b>"]
         mode_text = {1: "RSI Cơ bản", 2: "RSI Divergence V4", 3: "RSI + Divergence V4"}
         message_parts.append(f"📊 Mode: {mode_text.get(self.analysis_mode)}")
-        message_parts.append(f"📏 Khoảng cách: {self.min_candle_distance}-{self.max_candle_distance} nến")
+        message_parts.append(f"🏦 Markets: {', '.join(self.markets)}")
+        if self.profiles.source:
+            message_parts.append(f"🎚️ Profile: {self.profiles.primary}")
+        else:
+            message_parts.append(f"📏 Khoảng cách: {self.min_candle_distance}-{self.max_candle_distance} nến")
         message_parts.append(f"💡 Price: HIGH (Bearish) / LOW (Bullish)\n")
 
         stage_emoji = {'CONFIRMED': '✅', 'DEVELOPING': '🔄', 'FORMING': '🌱'}
@@ -494,16 +743,7 @@ class BinanceRSIAnalyzer:
         for interval in self.intervals:
             interval_data = data[interval]
 
-            interval_has_data = any([
-                interval_data['rsi_high'],
-                interval_data['rsi_low'],
-                interval_data['div_bullish_confirmed'],
-                interval_data['div_bullish_developing'],
-                interval_data['div_bullish_forming'],
-                interval_data['div_bearish_confirmed'],
-                interval_data['div_bearish_developing'],
-                interval_data['div_bearish_forming']
-            ])
+            interval_has_data = any(interval_data.values())
 
             if interval_has_data:
                 has_any_data = True
@@ -511,34 +751,41 @@ class BinanceRSIAnalyzer:
 
                 if self.analysis_mode in [1, 3]:
                     if interval_data['rsi_high']:
-                        message_parts.append(f"\n📈 <b>RSI ≥ {self.RSI_OVERBOUGHT}:</b>")
+                        message_parts.append(f"\n📈 <b>RSI quá mua:</b>")
                         for item in interval_data['rsi_high'][:10]:
-                            message_parts.append(f"• {item['Tên']} | <a href='{item['Chart URL']}'>Chart</a>")
+                            message_parts.append(f"• {item['Tên']} ({item['Loại']}) | <a href='{item['Chart URL']}'>Chart</a>")
 
                     if interval_data['rsi_low']:
-                        message_parts.append(f"\n📉 <b>RSI ≤ {self.RSI_OVERSOLD}:</b>")
+                        message_parts.append(f"\n📉 <b>RSI quá bán:</b>")
                         for item in interval_data['rsi_low'][:10]:
-                            message_parts.append(f"• {item['Tên']} | <a href='{item['Chart URL']}'>Chart</a>")
+                            message_parts.append(f"• {item['Tên']} ({item['Loại']}) | <a href='{item['Chart URL']}'>Chart</a>")
 
                 if self.analysis_mode in [2, 3]:
-                    for stage in ['confirmed', 'developing', 'forming']:
-                        key = f'div_bullish_{stage}'
-                        if interval_data[key]:
-                            message_parts.append(f"\n🟢 <b>BULLISH DIV - {stage_emoji[stage.upper()]} {stage.upper()}:</b>")
-                            for item in interval_data[key][:10]:
-                                message_parts.append(f"• {item['Tên']} | <a href='{item['Chart URL']}'>Chart</a>")
-
-                    for stage in ['confirmed', 'developing', 'forming']:
-                        key = f'div_bearish_{stage}'
-                        if interval_data[key]:
-                            message_parts.append(f"\n🔴 <b>BEARISH DIV - {stage_emoji[stage.upper()]} {stage.upper()}:</b>")
-                            for item in interval_data[key][:10]:
-                                message_parts.append(f"• {item['Tên']} | <a href='{item['Chart URL']}'>Chart</a>")
+                    for kind in DIVERGENCE_KINDS:
+                        emoji, title = DIVERGENCE_LABELS[kind]
+                        for stage in DIVERGENCE_STAGES:
+                            key = f'div_{kind}_{stage}'
+                            if interval_data[key]:
+                                message_parts.append(f"\n{emoji.split()[0]} <b>{title} - {stage_emoji[stage.upper()]} {stage.upper()}:</b>")
+                                for item in interval_data[key][:10]:
+                                    message_parts.append(f"• {item['Tên']} | <a href='{item['Chart URL']}'>Chart</a>")
 
         if not has_any_data:
             message_parts.append("\n✅ Không có tín hiệu nào")
 
+        if self.failures:
+            message_parts.append(f"\n⚠️ {len(self.failures)} symbol lỗi (retry lấy lại {self.recovered_count})")
+
         message = "\n".join(message_parts)
+        return self._post_telegram(message)
+
+    def _send_confluence_digest(self, table):
+        if not self.telegram_token or not self.telegram_chat_id:
+            return False
+        return self._post_telegram(self.confluence_scorer.telegram_digest(table))
+
+    def _post_telegram(self, message):
+        import requests
 
         if len(message) > 4000:
             message = message[:4000] + "\n\n... (truncated)"
@@ -573,8 +820,11 @@ class BinanceRSIAnalyzer:
             print(f"   ❌ Telegram Exception: {str(e)}")
             return False
 
-    def _save_to_excel(self, data):
-        with pd.ExcelWriter(self.excel_file, engine='openpyxl') as writer:
+    def _save_to_excel(self, data, confluence=None, file_path=None):
+        from openpyxl.styles import Border, Side, Font, Alignment, PatternFill
+
+        file_path = file_path or self.excel_file
+        with pd.ExcelWriter(file_path, engine='openpyxl') as writer:
             for interval in self.intervals:
                 rows = []
 
@@ -595,21 +845,15 @@ class BinanceRSIAnalyzer:
                         })
 
                 if self.analysis_mode in [2, 3]:
-                    for stage in ['confirmed', 'developing', 'forming']:
-                        for item in data[interval][f'div_bullish_{stage}']:
-                            rows.append({
-                                'Tên': item['Tên'],
-                                'Loại': item['Loại'],
-                                'Giai đoạn': item['Giai đoạn'],
-                                'Chart URL': item['Chart URL']
-                            })
-                        for item in data[interval][f'div_bearish_{stage}']:
-                            rows.append({
-                                'Tên': item['Tên'],
-                                'Loại': item['Loại'],
-                                'Giai đoạn': item['Giai đoạn'],
-                                'Chart URL': item['Chart URL']
-                            })
+                    for stage in DIVERGENCE_STAGES:
+                        for kind in DIVERGENCE_KINDS:
+                            for item in data[interval][f'div_{kind}_{stage}']:
+                                rows.append({
+                                    'Tên': item['Tên'],
+                                    'Loại': item['Loại'],
+                                    'Giai đoạn': item['Giai đoạn'],
+                                    'Chart URL': item['Chart URL']
+                                })
 
                 columns = ['Tên', 'Loại', 'Giai đoạn', 'Chart URL']
                 df = pd.DataFrame(rows, columns=columns) if rows else pd.DataFrame(columns=columns)
@@ -656,9 +900,106 @@ class BinanceRSIAnalyzer:
                 ws.auto_filter.ref = ws.dimensions
                 ws.freeze_panes = 'A2'
 
-        print(f'✅ Excel saved: {self.excel_file}')
+            extra_sheets = []
+            if confluence is not None:
+                extra_sheets.append(('confluence', confluence, '4F81BD'))
+            if self.failures:
+                extra_sheets.append(('failures', pd.DataFrame([f.to_row() for f in self.failures]), 'C0504D'))
+
+            for sheet_name, df, header_color in extra_sheets:
+                df.to_excel(writer, sheet_name=sheet_name, index=False)
+                ws = writer.sheets[sheet_name]
+                for col in ws.columns:
+                    max_length = max(len(str(cell.value or '')) for cell in col)
+                    ws.column_dimensions[col[0].column_letter].width = min((max_length + 2) * 1.2, 80)
+                for cell in ws[1]:
+                    cell.font = Font(bold=True, color='FFFFFF')
+                    cell.fill = PatternFill(start_color=header_color, end_color=header_color, fill_type='solid')
+                ws.freeze_panes = 'A2'
+
+        print(f'✅ Excel saved: {file_path}')
+
+    def _save_market_breadth(self, results):
+        # Ngưỡng quá mua/quá bán theo profile chính của từng series, giống _process_result
+        rows = self.profiles.rows([(r['symbol'], r['interval']) for r in results])
+        primary = self.profiles.primary
+        breadth = MarketBreadth(
+            results, self.intervals,
+            self.profiles.column(primary, 'overbought', rows), self.profiles.column(primary, 'oversold', rows)
+        )
+
+        print("📊 MARKET BREADTH:")
+        for line in breadth.summary_lines():
+            print(line)
+
+        breadth.save_matrix(self.matrix_file)
+        breadth.group_stats().to_csv(self.breadth_file)
+        if breadth.render_heatmap(self.heatmap_file):
+            print(f'✅ Heatmap saved: {self.heatmap_file}')
+        print(f'✅ RSI matrix saved: {self.matrix_file}')
+        return breadth
+
+    def _update_journal(self, results, processed_data):
+        signal_types = []
+        if self.analysis_mode in [1, 3]:
+            signal_types += ['rsi_high', 'rsi_low']
+        if self.analysis_mode in [2, 3]:
+            signal_types += DIVERGENCE_KINDS
+        records = self.journal.record(results, processed_data, signal_types=signal_types)
+        print(f"📓 Journal: {len(records)} tín hiệu mới/đổi giai đoạn")
+
+        stats = self.journal.accuracy_stats(self._price_at, horizon_hours=24)
+        if stats:
+            print("📓 Độ chính xác sau 24h (30 ngày gần nhất):")
+            for (signal_type, interval), row in stats.items():
+                print(f"   {interval} {signal_type}: n={row['count']} | hit={row['hit_rate']}% | avg={row['avg_change_pct']}%")
+
+    def _price_at(self, label, interval, ts_ms):
+        """
+        Giá mở cửa của nến đầu tiên bắt đầu từ ts_ms, None nếu không lấy được.
+        """
+        market, _, symbol = label.rpartition(':')
+        source = self.sources.get(market or 'spot')
+        if source is None:
+            return None
+        try:
+            klines = source.get_klines(symbol, interval, limit=1, start_time=ts_ms)
+            return float(klines[0][1]) if klines else None
+        except Exception:
+            return None
+
+    def _build_confluence(self, results, processed_data):
+        current_rsi = {(r['symbol'], r['interval']): r['current_rsi'] for r in results}
+        table = self.confluence_scorer.score(processed_data, self.intervals, current_rsi)
+        print(f"🎯 CONFLUENCE: {len(table)} symbol đồng thuận trên ≥{self.confluence_scorer.min_intervals} khung")
+        for _, row in table.head(10).iterrows():
+            print(f"   {row['Hướng']} {row['Tên']}: {row['Score']} | {row['Chi tiết']}")
+        return table
+
+    def _report_extra_profiles(self, results):
+        """
+        Các profile phụ dùng chung dữ liệu đã quét, mỗi profile ghi 1 file Excel riêng.
+        """
+        root, extension = os.path.splitext(self.excel_file)
+        for name in self.profiles.names[1:]:
+            processed = self._process_result(results, name)
+            counts = {}
+            for groups in processed.values():
+                for key, items in groups.items():
+                    counts[key] = counts.get(key, 0) + len(items)
+            rsi_count = counts['rsi_high'] + counts['rsi_low']
+            div_count = sum(v for k, v in counts.items() if k.startswith('div_'))
+            print(f"🎚️ Profile {name}: RSI={rsi_count} | Divergence={div_count}")
+            self._save_to_excel(processed, file_path=f'{root}_{name}{extension}')
 
     def _upload_to_google_sheet(self, data):
+        if not self.google_creds_json:
+            print("⚠️ Thiếu GOOGLE_SHEET_CREDENTIALS trong .env, bỏ qua Google Sheet")
+            return
+
+        import gspread
+        from oauth2client.service_account import ServiceAccountCredentials
+
         try:
             scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
             creds = ServiceAccountCredentials.from_json_keyfile_name(self.google_creds_json, scope)
@@ -681,15 +1022,12 @@ class BinanceRSIAnalyzer:
                         values.append([item['Tên'], item['Loại'], '-', item['Chart URL']])
 
                 if self.analysis_mode in [2, 3]:
-                    for stage in ['confirmed', 'developing', 'forming']:
-                        for item in data[interval].get(f'div_bullish_{stage}', []):
-                            values.append([
-                                item['Tên'], item['Loại'], item['Giai đoạn'], item['Chart URL']
-                            ])
-                        for item in data[interval].get(f'div_bearish_{stage}', []):
-                            values.append([
-                                item['Tên'], item['Loại'], item['Giai đoạn'], item['Chart URL']
-                            ])
+                    for stage in DIVERGENCE_STAGES:
+                        for kind in DIVERGENCE_KINDS:
+                            for item in data[interval].get(f'div_{kind}_{stage}', []):
+                                values.append([
+                                    item['Tên'], item['Loại'], item['Giai đoạn'], item['Chart URL']
+                                ])
 
                 worksheet.clear()
                 worksheet.update("A1", values)
@@ -700,6 +1038,90 @@ class BinanceRSIAnalyzer:
         except Exception as e:
             print(f"❌ Google Sheet error: {str(e)}")
 
+    def _run_jobs(self, jobs, label):
+        results = []
+        failures = []
+        with concurrent.futures.ThreadPoolExecutor(max_workers=10 * len(self.markets)) as executor:
+            futures = {
+                executor.submit(self._fetch_and_process_data, symbol, interval, market): (market, symbol, interval)
+                for market, symbol, interval in jobs
+            }
+            completed = 0
+            total = len(jobs)
+            for future in concurrent.futures.as_completed(futures):
+                completed += 1
+                print(f'\r📊 {label}: {(completed/total)*100:.1f}%', end='', flush=True)
+                try:
+                    results.append(future.result())
+                except ScanError as e:
+                    failures.append(e)
+        return results, failures
+
+    def _retry_transient(self, failures):
+        """
+        Sau đợt quét chính, chỉ lấy lại các lỗi tạm thời với backoff tăng dần.
+        """
+        results = []
+        for attempt in range(1, self.retry_attempts + 1):
+            pending = [f for f in failures if f.transient]
+            if not pending:
+                break
+            failures = [f for f in failures if not f.transient]
+
+            # 429 kèm Retry-After: chờ đúng thời gian server yêu cầu nếu dài hơn backoff
+            delay = self.retry_backoff * 2 ** (attempt - 1)
+            delay = max([delay] + [f.retry_after for f in pending if f.retry_after is not None])
+            print(f'🔁 Retry {attempt}/{self.retry_attempts}: {len(pending)} lỗi tạm thời, chờ {delay:g}s...')
+            time.sleep(delay)
+
+            jobs = [(f.market, f.symbol, f.interval) for f in pending]
+            retried, still_failed = self._run_jobs(jobs, f'retry {attempt}')
+            print()
+            results.extend(retried)
+            for f in still_failed:
+                f.attempts = attempt + 1
+            failures.extend(still_failed)
+        return results, failures
+
+    def _scan(self):
+        results = []
+        failures = []
+        # Mỗi market có rate limiter riêng nên các market được quét song song
+        for interval in self.intervals:
+            print(f'🔄 Processing {interval}...')
+            jobs = [
+                (market, symbol, interval)
+                for market in self.markets
+                for symbol in self.market_symbols[market]
+            ]
+            interval_results, interval_failures = self._run_jobs(jobs, interval)
+            results.extend(interval_results)
+            failures.extend(interval_failures)
+            print(f'\n✅ Done {interval}!')
+
+        transient_count = sum(1 for f in failures if f.transient)
+        retried, failures = self._retry_transient(failures)
+        results.extend(retried)
+
+        self.recovered_count = len(retried)
+        self.failures = failures
+        if transient_count:
+            print(f'✅ Retry: lấy lại được {self.recovered_count}/{transient_count}')
+        self._print_failures()
+        return results
+
+    def _print_failures(self):
+        if not self.failures:
+            return
+        counts = {}
+        for f in self.failures:
+            counts[f.reason] = counts.get(f.reason, 0) + 1
+        print(f"\n⚠️ {len(self.failures)} symbol lỗi: " + ', '.join(f'{k}={v}' for k, v in sorted(counts.items())))
+        for f in self.failures[:20]:
+            print(f'   • {f.market}:{f.symbol} {f.interval} [{f.reason}] {f.message[:80]}')
+        if len(self.failures) > 20:
+            print(f'   ... và {len(self.failures) - 20} lỗi khác (xem sheet failures)')
+
     def analyze(self):
         mode = ask_analysis_mode()
         if mode is None:
@@ -720,31 +1142,28 @@ class BinanceRSIAnalyzer:
 
         print(f"\n{'='*60}")
         print(f"📊 Mode: {self.analysis_mode} | RSI: {self.rsi_period} | Intervals: {self.intervals}")
-        print(f"📏 Khoảng cách phân kỳ: {self.min_candle_distance}-{self.max_candle_distance} nến")
-        print(f"🔍 Scan: {self.scan_candles} nến gần nhất")
+        print(f"🏦 Markets: {', '.join(self.markets)}")
         print(f"💡 Price comparison: HIGH (Bearish) / LOW (Bullish)")
-        print(f"⚙️ RSI Thresholds: OB={self.RSI_OVERBOUGHT} | OS={self.RSI_OVERSOLD} | Mid={self.RSI_LOWER_MID}-{self.RSI_UPPER_MID}")
-        print(f"⚙️ Confirm: Bearish={self.RSI_CONFIRM_BEARISH} | Bullish={self.RSI_CONFIRM_BULLISH}")
+        print(f"🎚️ Profiles: {self.profiles.describe()}")
+        if not self.profiles.source:
+            # Không có file profile: mọi series dùng chung các ngưỡng mặc định
+            print(f"📏 Khoảng cách phân kỳ: {self.min_candle_distance}-{self.max_candle_distance} nến")
+            print(f"🔍 Scan: {self.scan_candles} nến gần nhất")
+            print(f"⚙️ RSI Thresholds: OB={self.RSI_OVERBOUGHT} | OS={self.RSI_OVERSOLD} | Mid={self.RSI_LOWER_MID}-{self.RSI_UPPER_MID}")
+            print(f"⚙️ Confirm: Bearish={self.RSI_CONFIRM_BEARISH} | Bullish={self.RSI_CONFIRM_BULLISH}")
+        if self.indicator_filters:
+            print(f"🧰 Indicator filters: {', '.join(self.indicator_filters)}")
         print(f"{'='*60}\n")
 
-        results = []
-        for interval in self.intervals:
-            print(f'🔄 Processing {interval}...')
-            with concurrent.futures.ThreadPoolExecutor(max_workers=10) as executor:
-                futures = {
-                    executor.submit(self._fetch_and_process_data, symbol, interval): symbol
-                    for symbol in self.symbols
-                }
-                completed = 0
-                total = len(self.symbols)
-                for future in concurrent.futures.as_completed(futures):
-                    completed += 1
-                    print(f'\r📊 {interval}: {(completed/total)*100:.1f}%', end='', flush=True)
-                    result = future.result()
-                    if result:
-                        results.append(result)
-            print(f'\n✅ Done {interval}!')
+        results = self._scan()
+        self._report(results)
 
+        print(f'\n🔥 Complete!')
+
+    def _report(self, results):
+        """
+        Xử lý kết quả quét (từ 1 process hoặc gộp từ nhiều worker) và đẩy ra các sink.
+        """
         processed_data = self._process_result(results)
 
         print(f"\n{'='*70}")
@@ -752,8 +1171,8 @@ class BinanceRSIAnalyzer:
         for interval in self.intervals:
             print(f"\n⏰ {interval}:")
             if self.analysis_mode in [1, 3]:
-                print(f"   📈 RSI ≥ {self.RSI_OVERBOUGHT}: {len(processed_data[interval]['rsi_high'])}")
-                print(f"   📉 RSI ≤ {self.RSI_OVERSOLD}: {len(processed_data[interval]['rsi_low'])}")
+                print(f"   📈 RSI quá mua: {len(processed_data[interval]['rsi_high'])}")
+                print(f"   📉 RSI quá bán: {len(processed_data[interval]['rsi_low'])}")
             if self.analysis_mode in [2, 3]:
                 bull_c = len(processed_data[interval]['div_bullish_confirmed'])
                 bull_d = len(processed_data[interval]['div_bullish_developing'])
@@ -763,13 +1182,28 @@ class BinanceRSIAnalyzer:
                 bear_f = len(processed_data[interval]['div_bearish_forming'])
                 print(f"   🟢 Bullish Div: C={bull_c} D={bull_d} F={bull_f}")
                 print(f"   🔴 Bearish Div: C={bear_c} D={bear_d} F={bear_f}")
+                hidden_bull = [len(processed_data[interval][f'div_hidden_bullish_{stage}']) for stage in DIVERGENCE_STAGES[:2]]
+                hidden_bear = [len(processed_data[interval][f'div_hidden_bearish_{stage}']) for stage in DIVERGENCE_STAGES[:2]]
+                print(f"   🟢 Hidden Bullish: C={hidden_bull[0]} D={hidden_bull[1]}")
+                print(f"   🔴 Hidden Bearish: C={hidden_bear[0]} D={hidden_bear[1]}")
         print(f"{'='*70}\n")
 
-        self._save_to_excel(processed_data)
-        self._upload_to_google_sheet(processed_data)
-        self._send_telegram_message(processed_data)
-
-        print(f'\n🔥 Complete!')
+        breadth = self._save_market_breadth(results)
+        self._update_journal(results, processed_data)
+        confluence = self._build_confluence(results, processed_data)
+        self._save_to_excel(processed_data, confluence)
+        self._report_extra_profiles(results)
+        if self.dry_run:
+            print("🧪 DRY_RUN=1: bỏ qua Google Sheet và Telegram")
+        else:
+            self._upload_to_google_sheet(processed_data)
+            self._send_telegram_message(processed_data)
+            if len(self.intervals) > 1:
+                self._send_confluence_digest(confluence)
+
+        if self.result_store is not None:
+            self.result_store.publish(processed_data, breadth.matrix)
+        return processed_data
 
 
 if __name__ == "__main__":